@@ -0,0 +1,465 @@
+#!/usr/bin/python
+
+##Copyright (C) 2009 RobotCub Consortium, European Commission FP6 Project IST-004370
+##Permission is granted to copy, distribute, and/or modify this program
+##under the terms of the GNU General Public License, version 2 or any
+##later version published by the Free Software Foundation.
+##
+##A copy of the license can be found at
+##http://www.robotcub.org/icub/license/gpl.txt
+##
+##This program is distributed in the hope that it will be useful, but
+##WITHOUT ANY WARRANTY; without even the implied warranty of
+##MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+##Public License for more details
+
+## Benchmark of manager.py and icub-cluster.py without a robot network.
+##
+## The script puts fake yarp, yarprun and ssh executables on PATH (that
+## run this script again, see fakeMain), generates application and cluster
+## descriptors of growing size and times the main operations end to end:
+## runModules, checkPorts and connectPorts of manager.py, checkNodes and
+## runNodes of icub-cluster.py. The fakes keep the state of the
+## simulated network (registered ports, connections, running modules)
+## as files in a temporary directory and answer after a random latency;
+## they can also fail or hang with a given probability.
+##
+## Results are printed as a table with throughput and the scaling
+## exponent of every operation (time ~ N^k), they can be saved with
+## --save and compared with --baseline to catch regressions.
+
+import sys
+import os
+import time
+import random
+import json
+import math
+import imp
+import shutil
+import tempfile
+
+# a couple of constants
+SIZES=[10, 50, 100]           #modules/connections/nodes per run
+MODULES_PER_NODE=10           #modules of a synthetic application per node
+LATENCY=0.05                  #seconds, mean latency of a fake command
+HANG_TIME=2                   #seconds a hanging fake command takes
+TOLERANCE=0.25                #slowdown against the baseline reported as a regression
+
+FAKES=['yarp', 'yarprun', 'ssh']
+
+## Fake commands
+
+def statePath(kind, name):
+    d=os.path.join(os.environ['BENCH_STATE'], kind)
+    if not os.path.isdir(d):
+        try:
+            os.makedirs(d)
+        except OSError:
+            pass
+    return os.path.join(d, name.replace('/', '%'))
+
+def hasState(kind, name):
+    return os.path.exists(statePath(kind, name))
+
+def putState(kind, name):
+    open(statePath(kind, name), 'w').close()
+
+def removeState(kind, name):
+    try:
+        os.remove(statePath(kind, name))
+    except OSError:
+        pass
+
+def listState(kind):
+    d=os.path.join(os.environ['BENCH_STATE'], kind)
+    if not os.path.isdir(d):
+        return []
+    return [f.replace('%', '/') for f in os.listdir(d)]
+
+# latency of one fake command, BENCH_DIST is fixed, uniform or exp
+def fakeLatency():
+    mean=float(os.environ.get('BENCH_LATENCY', LATENCY))
+    dist=os.environ.get('BENCH_DIST', 'exp')
+    if dist=='fixed':
+        return mean
+    if dist=='uniform':
+        return random.uniform(0, 2*mean)
+    return random.expovariate(1.0/mean)
+
+def fakeYarp(args):
+    if args[0]=='exists':
+        if len(args)==2:
+            return int(not hasState('ports', args[1]))
+        return int(not hasState('conns', args[1]+' '+args[2]))
+    if args[0]=='name' and args[1:2]==['list']:
+        for p in listState('ports'):
+            print 'registration name %s ip 127.0.0.1 port 10001 type tcp' % p
+        print '*** end of message'
+        return 0
+    if args[0]=='connect':
+        if hasState('ports', args[1]) and hasState('ports', args[2]):
+            putState('conns', args[1]+' '+args[2])
+            return 0
+        return 1
+    if args[0]=='disconnect':
+        removeState('conns', args[1]+' '+args[2])
+        return 0
+    return 1
+
+def fakeYarprun(args):
+    node=args[args.index('--on')+1]
+    if not hasState('ports', node):
+        # yarprun waits for an answer that never comes
+        time.sleep(HANG_TIME)
+        return 1
+
+    if '--cmd' in args:
+        tag=args[args.index('--as')+1]
+        putState('running', node+' '+tag)
+        cmd=args[args.index('--cmd')+1].strip('"').split()
+        if '--name' in cmd:
+            name=cmd[cmd.index('--name')+1]
+            for port in (name, name+'/out', name+'/in'):
+                putState('ports', port)
+        return 0
+    if '--isrunning' in args:
+        return int(not hasState('running', node+' '+args[args.index('--isrunning')+1]))
+    if '--ps' in args:
+        for r in listState('running'):
+            n, tag=r.split(' ', 1)
+            if n==node:
+                print '(pid 1) (tag %s) (status running) (cmd "x") (env "")' % tag
+        return 0
+    for action in ('--sigterm', '--kill'):
+        if action in args:
+            removeState('running', node+' '+args[args.index(action)+1])
+            return 0
+    return 1
+
+# ssh -f [options] [user@]host icub-cluster-run.sh start|stop|kill ...
+def fakeSsh(args):
+    args=[a for a in args if a!='-f']
+    for i in range(len(args)):
+        if args[i].endswith('.sh'):
+            break
+    else:
+        return 1
+
+    host=args[i-1].split('@')[-1]
+    action=args[i+1].strip()
+    if args[i]=='icub-cluster-run.sh':
+        if action=='start':
+            putState('ports', '/'+host)
+        else:
+            removeState('ports', '/'+host)
+    return 0
+
+def fakeMain(prog, args):
+    fd=os.open(os.path.join(os.environ['BENCH_STATE'], 'calls'), os.O_WRONLY|os.O_APPEND|os.O_CREAT)
+    os.write(fd, prog+"\n")
+    os.close(fd)
+
+    time.sleep(fakeLatency())
+    if random.random()<float(os.environ.get('BENCH_HANG', 0)):
+        time.sleep(float(os.environ.get('BENCH_HANG_TIME', HANG_TIME)))
+    if random.random()<float(os.environ.get('BENCH_FAIL', 0)):
+        return 1
+
+    if prog=='yarp':
+        return fakeYarp(args)
+    if prog=='yarprun':
+        return fakeYarprun(args)
+    return fakeSsh(args)
+
+## Synthetic descriptors
+
+def nodeName(i):
+    return 'bnode%d' % i
+
+def writeApplication(path, modules, nodes):
+    f=open(path, 'w')
+    f.write('<application>\n<name>Bench%d</name>\n' % modules)
+    f.write('<dependencies><port>/root</port></dependencies>\n')
+    for i in range(modules):
+        f.write('<module><name>module%d</name><parameters>--name /m%d</parameters>'
+                '<node>%s</node><tag>m%d</tag></module>\n' % (i, i, nodeName(i%nodes), i))
+    # a chain m0 -> m1 -> ... one connection per module
+    for i in range(modules):
+        f.write('<connection><from>/m%d/out</from><to>/m%d/in</to></connection>\n'
+                % (i, (i+1)%modules))
+    f.write('</application>\n')
+    f.close()
+
+def writeCluster(path, nodes):
+    f=open(path, 'w')
+    f.write('<cluster name="bench" user="bench">\n')
+    f.write('<nameserver namespace="/root" node="%s"/>\n' % nodeName(0))
+    for i in range(nodes):
+        f.write('<node>%s</node>\n' % nodeName(i))
+    f.write('</cluster>\n')
+    f.close()
+
+## Stand-in name and yarprun servers working on the state of the
+## fakes: nodes are found at the address of the yarprun server, which
+## answers after the same latency as the fake yarprun
+def stateServers():
+    import yarpclient
+
+    class StateNameServer(yarpclient.StandInNameServer):
+        def ports(self):
+            return listState('ports')
+
+        def register(self, name):
+            putState('ports', name)
+
+        def unregister(self, name):
+            removeState('ports', name)
+
+        def portAddress(self, name):
+            if name.startswith('/'+nodeName(0)[:-1]):
+                return runServer.address()
+            return self.server_address
+
+    class StateRunServer(yarpclient.StandInRunServer):
+        def answer(self, request):
+            time.sleep(fakeLatency())
+            return yarpclient.StandInRunServer.answer(self, request)
+
+        def startProcess(self, node, tag, cmd):
+            putState('running', node+' '+tag)
+            cmd=cmd.split()
+            if '--name' in cmd:
+                name=cmd[cmd.index('--name')+1]
+                for port in (name, name+'/out', name+'/in'):
+                    putState('ports', port)
+            return 1
+
+        def stopProcess(self, node, tag):
+            found=hasState('running', node+' '+tag)
+            removeState('running', node+' '+tag)
+            return found
+
+        def processes(self, node):
+            res=[]
+            for r in listState('running'):
+                n, tag=r.split(' ', 1)
+                if n==node:
+                    res.append((1, tag, ''))
+            return res
+
+    runServer=StateRunServer()
+    return StateNameServer(), runServer
+
+## Benchmark
+
+class Bench:
+    def __init__(self, workdir, native=False):
+        self.workdir=workdir
+        self.state=os.path.join(workdir, 'state')
+        self.results=[]
+
+        # fake executables first on PATH
+        bin=os.path.join(workdir, 'bin')
+        os.mkdir(bin)
+        script=os.path.abspath(__file__)
+        for prog in FAKES:
+            path=os.path.join(bin, prog)
+            f=open(path, 'w')
+            f.write('#!/bin/sh\nexec "%s" "%s" --fake %s "$@"\n' % (sys.executable, script, prog))
+            f.close()
+            os.chmod(path, 0755)
+        os.environ['PATH']=bin+os.pathsep+os.environ['PATH']
+        os.environ['BENCH_STATE']=self.state
+        # where manager.py puts its logs and descriptor cache
+        os.environ['TMP']=workdir
+        # never find the name server of the real network
+        os.environ['HOME']=workdir
+        os.environ.pop('YARP_CONF', None)
+        os.environ.pop('YARP_NAMESERVER', None)
+
+        # port checks and yarprun commands through the native clients
+        # (see yarpclient.py)
+        self.nameServer=None
+        self.runServer=None
+        if native:
+            self.nameServer, self.runServer=stateServers()
+            self.nameServer.serve()
+            self.runServer.serve()
+            os.environ['YARP_NAMESERVER']="%s:%d" % self.nameServer.address()
+
+        here=os.path.dirname(os.path.abspath(__file__))
+        self.manager=imp.load_source('manager', os.path.join(here, 'manager.py'))
+        self.cluster=imp.load_source('icubcluster', os.path.join(here, 'icub-cluster.py'))
+
+    def close(self):
+        for server in (self.nameServer, self.runServer):
+            if server!=None:
+                server.stop()
+
+    def reset(self):
+        if os.path.isdir(self.state):
+            shutil.rmtree(self.state)
+        os.mkdir(self.state)
+        putState('ports', '/root')
+
+    def calls(self):
+        try:
+            return len(open(os.path.join(self.state, 'calls')).readlines())
+        except IOError:
+            return 0
+
+    # run fn() with the output of the scripts out of the way
+    def time(self, name, size, fn):
+        calls=self.calls()
+        stdout=sys.stdout
+        sys.stdout=open(os.devnull, 'w')
+        start=time.time()
+        try:
+            res=fn()
+        finally:
+            elapsed=time.time()-start
+            sys.stdout.close()
+            sys.stdout=stdout
+
+        self.results.append({'operation':name, 'size':size, 'elapsed':round(elapsed, 4),
+                             'commands':self.calls()-calls})
+        print "%-24s %6d %10.3f %10d %10.1f" % (name, size, elapsed, self.calls()-calls, size/max(elapsed, 1e-6))
+        sys.stdout.flush()
+        return res
+
+    def runManager(self, size):
+        self.reset()
+        nodes=max(1, size/MODULES_PER_NODE)
+        for i in range(nodes):
+            putState('ports', '/'+nodeName(i))
+
+        path=os.path.join(self.workdir, 'app%d.xml' % size)
+        writeApplication(path, size, nodes)
+
+        m=self.manager
+        application=self.time('loadApplications', size, lambda: m.loadApplications(path))[0]
+        self.time('loadApplications cached', size, lambda: m.loadApplications(path))
+
+        engine=m.Engine(application, m.Shared())
+        data=list(application.modules)
+        conns=[(c.output, c.input, c.protocol) for c in application.connections]
+
+        # every operation starts from an empty status cache
+        for name, fn in (('runModules', lambda: engine.runModules(data, conns)),
+                         ('checkPorts', lambda: engine.checkPorts(conns)),
+                         ('connectPorts', lambda: engine.connectPorts(conns))):
+            engine.cache.invalidate(kinds=('module', 'port', 'conn'))
+            self.time(name, size, fn)
+        engine.close()
+
+    def runCluster(self, size):
+        self.reset()
+        path=os.path.join(self.workdir, 'cluster%d.xml' % size)
+        writeCluster(path, size)
+
+        cl=self.cluster.loadCluster(path)
+        self.time('checkNodes', size, cl.checkNodes)
+        self.time('runNodes', size, lambda: cl.runNodes([1]*size, [0]*size))
+
+    def scaling(self):
+        print
+        print "%-24s %10s" % ("operation", "exponent")
+        exponents={}
+        names=[]
+        for r in self.results:
+            if r['operation'] not in names:
+                names.append(r['operation'])
+
+        for name in names:
+            points=[(math.log(r['size']), math.log(max(r['elapsed'], 1e-6)))
+                    for r in self.results if r['operation']==name]
+            if len(points)<2:
+                continue
+            # least squares slope of log(time) over log(size)
+            mx=sum([p[0] for p in points])/len(points)
+            my=sum([p[1] for p in points])/len(points)
+            num=sum([(p[0]-mx)*(p[1]-my) for p in points])
+            den=sum([(p[0]-mx)**2 for p in points])
+            if den==0:
+                continue
+            exponents[name]=round(num/den, 3)
+            print "%-24s %10.2f" % (name, exponents[name])
+        return exponents
+
+# compare with a previous run, returns the operations that got slower
+def compare(results, baseline, tolerance):
+    old={}
+    for r in baseline['results']:
+        old[(r['operation'], r['size'])]=r['elapsed']
+
+    regressions=[]
+    for r in results:
+        before=old.get((r['operation'], r['size']))
+        if before!=None and r['elapsed']>before*(1+tolerance):
+            regressions.append((r['operation'], r['size'], before, r['elapsed']))
+    return regressions
+
+def printUsage(scriptName):
+    print scriptName, ": benchmark of manager.py and icub-cluster.py with simulated yarp, yarprun and ssh"
+    print "Usage:"
+    print scriptName,
+    print "[--sizes 10,50,100] [--latency s] [--dist fixed|uniform|exp] [--fail p] [--hang p]"
+    print "  [--hang-time s] [--only manager|cluster] [--native yes|no] [--save file.json] [--baseline file.json] [--tolerance f]"
+    print "  --latency, --dist: mean and distribution of the latency of every fake command"
+    print "  --fail, --hang: probability of a fake command failing or hanging for --hang-time seconds"
+    print "  --native: use the name server and yarprun clients of yarpclient.py, with stand-in servers"
+    print "  --baseline: exit with 1 if an operation is slower than in the baseline by more than --tolerance"
+
+if __name__ == '__main__':
+
+    if sys.argv[1:2]==['--fake']:
+        sys.exit(fakeMain(sys.argv[2], sys.argv[3:]))
+
+    options={'--sizes':",".join([str(s) for s in SIZES]), '--latency':str(LATENCY), '--dist':'exp',
+             '--fail':'0', '--hang':'0', '--hang-time':str(HANG_TIME), '--only':None,
+             '--native':'no', '--save':None, '--baseline':None, '--tolerance':str(TOLERANCE)}
+    args=sys.argv[1:]
+    while args:
+        if args[0] not in options or len(args)<2:
+            printUsage("benchmark.py")
+            sys.exit(1)
+        options[args[0]]=args[1]
+        args=args[2:]
+
+    sizes=[int(s) for s in options['--sizes'].split(',')]
+    os.environ['BENCH_LATENCY']=options['--latency']
+    os.environ['BENCH_DIST']=options['--dist']
+    os.environ['BENCH_FAIL']=options['--fail']
+    os.environ['BENCH_HANG']=options['--hang']
+    os.environ['BENCH_HANG_TIME']=options['--hang-time']
+
+    workdir=tempfile.mkdtemp(prefix='bench-')
+    bench=None
+    try:
+        bench=Bench(workdir, options['--native']=='yes')
+        print "%-24s %6s %10s %10s %10s" % ("operation", "N", "seconds", "commands", "N/s")
+        for size in sizes:
+            if options['--only'] in (None, 'manager'):
+                bench.runManager(size)
+            if options['--only'] in (None, 'cluster'):
+                bench.runCluster(size)
+        exponents=bench.scaling()
+    finally:
+        if bench!=None:
+            bench.close()
+        shutil.rmtree(workdir, True)
+
+    report={'options':options, 'results':bench.results, 'exponents':exponents}
+    if options['--save']!=None:
+        f=open(options['--save'], 'w')
+        f.write(json.dumps(report, indent=2, sort_keys=True)+"\n")
+        f.close()
+
+    if options['--baseline']!=None:
+        regressions=compare(bench.results, json.load(open(options['--baseline'])), float(options['--tolerance']))
+        print
+        for name, size, before, after in regressions:
+            print "REGRESSION %s N=%d: %.3fs -> %.3fs" % (name, size, before, after)
+        if regressions:
+            sys.exit(1)
+        print "No regressions against", options['--baseline']
@@ -21,9 +21,20 @@
 
 import xml.dom.minidom
 import subprocess
+import sys
 import os
 import time
-from Tkinter import *
+
+# the GUI is only needed when run as a script, loadCluster() and the
+# Cluster methods can be used without a display (see benchmark.py)
+if __name__ == '__main__':
+    from Tkinter import *
+
+# native name server client, the yarp binary is used without it
+try:
+    import yarpclient
+except ImportError:
+    yarpclient=None
 
 
 class Util:
@@ -123,6 +134,9 @@ class Cluster:
         self.nsNode=nsNode
         self.ssh_options=ssh_options
         self.nodes=nodes
+        self.names=None
+        if yarpclient!=None:
+            self.names=yarpclient.NameClient.fromConfig(namespace)
 
     def display(self):
         print "--- Cluster %s:" %self.name
@@ -142,6 +156,125 @@ class Cluster:
 
         print "------------"
 
+    ## Node and nameserver management, without GUI: selected and logged
+    ## are lists of flags, one per node, and the check methods return
+    ## one running flag per node
+    # like "yarp exists port", asking the name server directly when
+    # possible
+    def portExists(self, port):
+        if self.names!=None:
+            try:
+                return self.names.exists(port)
+            except yarpclient.NameClientError, e:
+                print "--> Name server client:", str(e)
+
+        cmd=['yarp', 'exists', port]
+        print 'Running',
+        print " ".join(cmd)
+        return subprocess.Popen(cmd).wait()==0
+
+    def checkNode(self, node):
+        running=self.portExists('/'+node.name)
+        if running:
+            print 'setting',
+            print node.name
+        return running
+
+    def checkNodes(self):
+        print 'Checking nodes'
+        return [self.checkNode(node) for node in self.nodes]
+
+    def runNodes(self, selected, logged):
+        print 'Starting  nodes'
+        values=self.checkNodes()
+        for node, running, sel, log in zip(self.nodes, values, selected, logged):
+            if not running and sel:
+                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' start ' , node.name]
+
+                if node.display:
+                    if (node.displayValue == ""):
+                        cmd.append('display')
+                    else:
+                        cmd.append('display ')
+                        cmd.append(node.displayValue)
+
+                if log:
+                    cmd.append('log')
+                #else:
+                    #cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' start ']
+
+                print 'Running',
+                print " ".join(cmd)
+                ret=subprocess.Popen(cmd).wait()
+            else:
+                print node.name,
+                print ' already running skipping'
+
+        time.sleep(0.5)
+        return self.checkNodes()
+
+    def stopNodes(self, selected):
+        print 'Stopping  nodes'
+        values=self.checkNodes()
+
+        for node, running, sel in zip(self.nodes, values, selected):
+            if running and sel:
+                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' stop']
+                print 'Running',
+                print " ".join(cmd)
+                ret=subprocess.Popen(cmd).wait()
+            else:
+                print node.name,
+                print ' not running skipping'
+
+        time.sleep(0.5)
+        return self.checkNodes()
+
+    def killNodes(self, selected):
+        print 'Killing  nodes'
+        for node, sel in zip(self.nodes, selected):
+            if (sel):
+                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' kill']
+                print " ".join(cmd)
+                ret=subprocess.Popen(cmd).wait()
+
+        time.sleep(0.5)
+        return self.checkNodes()
+
+    def checkNs(self):
+        print 'Checking ns'
+        return self.portExists(self.namespace)
+
+    # user and nsNode as currently set in the GUI
+    def runNs(self, user, nsNode, ros):
+        print 'Running nameserver'
+        if not self.checkNs():
+            cmd = Util.getSshCmd(user, nsNode, self.ssh_options) + ['icub-cluster-server.sh', ' start']
+
+            if ros:
+                cmd.append('ros')
+            print 'Running',
+            print " ".join(cmd)
+            ret=subprocess.Popen(cmd).wait()
+            time.sleep(0.5)
+            return self.checkNs()
+        else:
+            print 'Nameserver already running'
+            return True
+
+    def stopNs(self, user, nsNode):
+        print 'Stopping nameserver'
+        if self.checkNs():
+            cmd = Util.getSshCmd(user, nsNode, self.ssh_options) + ['icub-cluster-server.sh', ' stop']
+            print 'Running',
+            print " ".join(cmd)
+            ret=subprocess.Popen(cmd).wait()
+            time.sleep(0.5)
+            return self.checkNs()
+        else:
+            print 'Nameserver was not running'
+            return False
+
 class App:
     def __init__(self, master):
         frame = Frame(master)
@@ -301,132 +434,30 @@ class App:
     def executeWnd(self):
         a=RemoteExecWindow(self.master, self.clusterUser.get(), self.cluster.nodes)
 
-    def checkNodes(self):
-        print 'Checking nodes'
-        i=iter(self.values)
+    def setNodes(self, values):
+        for v, running in zip(self.values, values):
+            v.set(int(running))
 
-        for node in self.cluster.nodes:
-            cmd=['yarp', 'exists', '/'+node.name]
-            print 'Running',
-            print " ".join(cmd)
-            ret=subprocess.Popen(cmd).wait()
-            if ret==0:
-                print 'setting',
-                print node.name
-                i.next().set(1)
-            else:
-                i.next().set(0)
+    def checkNodes(self):
+        self.setNodes(self.cluster.checkNodes())
 
     def runNodes(self):
-        print 'Starting  nodes'
-        self.checkNodes()
-        i=iter(self.values)
-        iS=iter(self.selected)
-        iSS=iter(self.logged)
-        for node in self.cluster.nodes:
-            selected=iS.next().get()
-            running=i.next().get()
-            logged=iSS.next().get()
-
-            if running==0 and selected==1:
-                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' start ' , node.name]
-
-                if node.display:
-                    if (node.displayValue == ""):
-                        cmd.append('display')
-                    else:
-                        cmd.append('display ')
-                        cmd.append(node.displayValue)
-
-                if logged==1:
-                    cmd.append('log')
-                #else:
-                    #cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' start ']
-
-                print 'Running',
-                print " ".join(cmd)
-                ret=subprocess.Popen(cmd).wait()
-            else:
-                print node.name,
-                print ' already running skipping'
-
-        time.sleep(0.5)
-        self.checkNodes()
+        self.setNodes(self.cluster.runNodes([v.get() for v in self.selected], [v.get() for v in self.logged]))
 
     def stopNodes(self):
-        print 'Stopping  nodes'
-        self.checkNodes()
-
-        i=iter(self.values)
-        iS=iter(self.selected)
-        for node in self.cluster.nodes:
-            selected=iS.next().get()
-            running=i.next().get()
-
-            if running==1 and selected==1 :
-                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' stop']
-                print 'Running',
-                print " ".join(cmd)
-                ret=subprocess.Popen(cmd).wait()
-            else:
-                print node.name,
-                print ' not running skipping'
-
-        time.sleep(0.5)
-        self.checkNodes()
+        self.setNodes(self.cluster.stopNodes([v.get() for v in self.selected]))
 
     def killNodes(self):
-        print 'Killing  nodes'
-        iS=iter(self.selected)
-        for node in self.cluster.nodes:
-            selected=iS.next().get()
-            if (selected):
-                cmd = Util.getSshCmd(node.user, node.name, node.ssh_options) + ['icub-cluster-run.sh', ' kill']
-                print " ".join(cmd)
-                ret=subprocess.Popen(cmd).wait()
-
-        time.sleep(0.5)
-        self.checkNodes()
+        self.setNodes(self.cluster.killNodes([v.get() for v in self.selected]))
 
     def checkNs(self):
-        print 'Checking ns'
-        cmd=['yarp', 'exists', self.cluster.namespace]
-        print 'Running',
-        print " ".join(cmd)
-        ret=subprocess.Popen(cmd).wait()
-        if ret==0:
-            self.nsFlag.set(1)
-        else:
-            self.nsFlag.set(0)
+        self.nsFlag.set(int(self.cluster.checkNs()))
 
     def runNs(self):
-        print 'Running nameserver'
-        self.checkNs()
-        if self.nsFlag.get()==0:
-            cmd = Util.getSshCmd(self.clusterUser.get(), self.clusterNsNode.get(), self.cluster.ssh_options) + ['icub-cluster-server.sh', ' start']
-
-            if self.ROSoption.get()==1:
-                cmd.append('ros')
-            print 'Running',
-            print " ".join(cmd)
-            ret=subprocess.Popen(cmd).wait()
-            time.sleep(0.5)
-            self.checkNs()
-        else:
-            print 'Nameserver already running'
+        self.nsFlag.set(int(self.cluster.runNs(self.clusterUser.get(), self.clusterNsNode.get(), self.ROSoption.get()==1)))
 
     def stopNs(self):
-        print 'Stopping nameserver'
-        self.checkNs()
-        if self.nsFlag.get()==1:
-            cmd = Util.getSshCmd(self.clusterUser.get(), self.clusterNsNode.get(), self.cluster.ssh_options) + ['icub-cluster-server.sh', ' stop']
-            print 'Running',
-            print " ".join(cmd)
-            ret=subprocess.Popen(cmd).wait()
-            time.sleep(0.5)
-            self.checkNs()
-        else:
-            print 'Nameserver was not running'
+        self.nsFlag.set(int(self.cluster.stopNs(self.clusterUser.get(), self.clusterNsNode.get())))
 
 def check_output(*popenargs, **kwargs):
     process = subprocess.Popen(stdout=subprocess.PIPE, *popenargs, **kwargs)
@@ -441,50 +472,9 @@ def check_output(*popenargs, **kwargs):
         raise error
     return output
 
-def printUsage(scriptName):
-    print scriptName, ": python gui for managing yarprun servers (Linux only)"
-    print "Usage:"
-    print scriptName,
-    print "[xml_configuration_file] [context]\n"
-    print "  xml_configuration_file: cluster configuration file (default: cluster-config.xml)."
-    print "  context: context where xml configuration file is sought through yarp's ResourceFinder (default: iCubCluster)."
-    print "  To learn how to write a valid cluster-config.xml see example in app/iCubCluster/conf"
-
-
-if __name__ == '__main__':
-
-    #first check arguments
-    argc = len(sys.argv)
-
-    if (argc>2):
-         contextName=sys.argv[2]
-    else:
-         contextName="iCubCluster"
-    if (argc>1):
-         configFileName=sys.argv[1]
-    else:
-         configFileName="cluster-config.xml"
-
-    if (configFileName == "help"):
-        printUsage("icub-cluster.py")
-        sys.exit(1)
-
-    print "Config file name: " + configFileName + ", context name: " + contextName
-
-    if(sys.hexversion < 0x02070000):
-        configFilePath=check_output(["yarp",  "resource",  "--find", configFileName, "--context", contextName])
-    else:
-        configFilePath=subprocess.check_output(["yarp",  "resource",  "--find", configFileName, "--context", contextName])
-    if not configFilePath[1:-2] :  # "slicing" output variable to remove quotes and EOL
-       print "Could not find file " + configFileName + " in context " + contextName + ", exiting."
-       sys.exit(1)
-
-    if(sys.hexversion < 0x02070000):
-        iconFilePath=check_output(["yarp",  "resource",  "--find", "icub-cluster-icon.png", "--context", contextName])
-    else:
-        iconFilePath=subprocess.check_output(["yarp",  "resource",  "--find", "icub-cluster-icon.png", "--context", contextName])
-
-    config = xml.dom.minidom.parse(configFilePath[1:-2])
+## parse a cluster configuration file, returns the (last) cluster
+def loadCluster(configFile):
+    config = xml.dom.minidom.parse(configFile)
 
     clusters=config.getElementsByTagName("cluster")
 
@@ -529,7 +519,52 @@ if __name__ == '__main__':
         else:
             ssh_options="";
 
-    cl=Cluster(name, user, namespace, namespaceNode, ssh_options, nodeList)
+    return Cluster(name, user, namespace, namespaceNode, ssh_options, nodeList)
+
+def printUsage(scriptName):
+    print scriptName, ": python gui for managing yarprun servers (Linux only)"
+    print "Usage:"
+    print scriptName,
+    print "[xml_configuration_file] [context]\n"
+    print "  xml_configuration_file: cluster configuration file (default: cluster-config.xml)."
+    print "  context: context where xml configuration file is sought through yarp's ResourceFinder (default: iCubCluster)."
+    print "  To learn how to write a valid cluster-config.xml see example in app/iCubCluster/conf"
+
+
+if __name__ == '__main__':
+
+    #first check arguments
+    argc = len(sys.argv)
+
+    if (argc>2):
+         contextName=sys.argv[2]
+    else:
+         contextName="iCubCluster"
+    if (argc>1):
+         configFileName=sys.argv[1]
+    else:
+         configFileName="cluster-config.xml"
+
+    if (configFileName == "help"):
+        printUsage("icub-cluster.py")
+        sys.exit(1)
+
+    print "Config file name: " + configFileName + ", context name: " + contextName
+
+    if(sys.hexversion < 0x02070000):
+        configFilePath=check_output(["yarp",  "resource",  "--find", configFileName, "--context", contextName])
+    else:
+        configFilePath=subprocess.check_output(["yarp",  "resource",  "--find", configFileName, "--context", contextName])
+    if not configFilePath[1:-2] :  # "slicing" output variable to remove quotes and EOL
+       print "Could not find file " + configFileName + " in context " + contextName + ", exiting."
+       sys.exit(1)
+
+    if(sys.hexversion < 0x02070000):
+        iconFilePath=check_output(["yarp",  "resource",  "--find", "icub-cluster-icon.png", "--context", contextName])
+    else:
+        iconFilePath=subprocess.check_output(["yarp",  "resource",  "--find", "icub-cluster-icon.png", "--context", contextName])
+
+    cl=loadCluster(configFilePath[1:-2])
     cl.display()
 
     root = Tk()
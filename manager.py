@@ -26,19 +26,85 @@
 
 import sys
 import time
-import xml.dom.minidom
 import subprocess
 import os
 import signal
-import datetime
-from Tkinter import *
+import select
+import threading
+import Queue
+import re
+import json
+import hashlib
+import marshal
+import stat
+import StringIO
+import collections
+import ConfigParser
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+# the batch mode (see runBatch) runs without a display and never
+# imports Tkinter, neither does importing this file as a module
+# (see benchmark.py)
+BATCH_ACTIONS=['--run', '--stop', '--kill', '--shutdown', '--check', '--connect', '--disconnect', '--supervise']
+HEADLESS=(__name__ != '__main__' or len([a for a in sys.argv[2:] if a in BATCH_ACTIONS])>0)
+if not HEADLESS:
+    from Tkinter import *
 
 # see portableKill function
 import ctypes
 
+# when the process started, see Manager.startupReport()
+STARTED=time.time()
+
+# native name server client, the yarp binary is used without it
+try:
+    import yarpclient
+except ImportError:
+    yarpclient=None
+
 # a couple of constants
-PROCESS_TIMEOUT=240           #seconds
-PROCESS_POLL_INTERVAL=0.05    #seconds
+PROCESS_TIMEOUT=240           #seconds, longest a command may take
+TIMEOUT_INITIAL=30            #seconds a command may take until its class has latency samples
+TIMEOUT_MIN=2                 #seconds, shortest adapted deadline
+TIMEOUT_MARGIN=3              #adapted deadline is this many times the expected latency
+TIMEOUT_SAMPLES=5             #commands of a class seen before its deadline adapts
+BREAKER_RETRY=10              #seconds an unreachable node is failed fast before probing it again
+BREAKER_PROBE_TIMEOUT=5       #seconds the probe of an unreachable node may take
+PROCESS_READ_SIZE=4096        #bytes per read from a child's pipe
+MAX_WORKERS=16                #concurrent yarp/yarprun processes
+MAX_PROCESSES=32              #yarp/yarprun processes forked at the same time, all applications, see Limiter
+NODE_LIMITS={'launchRate':10, 'launchBurst':5, 'maxInFlight':8}  #per node, see Limiter
+LIMIT_POLL=0.1                #seconds between checks of a limit being waited for
+LAUNCH_CONCURRENCY=8          #modules started at the same time
+CONNECT_CONCURRENCY=8         #connect/disconnect commands at the same time
+CONNECT_RETRIES=2             #retries of a failed connect/disconnect
+CONNECT_RETRY_DELAY=0.5       #seconds before the first retry, doubled at each one
+SHUTDOWN_TIMEOUT=20           #seconds modules are given to exit on SIGTERM, in total
+SHUTDOWN_POLL=0.5             #seconds between checks of the modules asked to exit
+SHUTDOWN_MIN_GRACE=2          #seconds each wave is given to exit on SIGTERM, even past SHUTDOWN_TIMEOUT
+STATUS_CACHE_TTL=5            #seconds a module/port status is reused
+ACTION_WORKERS=2              #GUI actions running at the same time
+UI_UPDATE_INTERVAL=100        #milliseconds between batches of GUI updates
+NATIVE_YARPRUN=True           #talk to the yarprun servers without forking yarprun
+LOG_MAX_SIZE=10*1024*1024     #bytes before the operation log is rotated
+LOG_BACKUPS=3                 #rotated operation logs kept
+LOG_FLUSH_INTERVAL=1          #seconds an operation log record may wait
+LATENCY_BUCKETS=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  #seconds, upper limits
+STATS_UPDATE_INTERVAL=1000    #milliseconds between refreshes of the statistics/output windows
+OUTPUT_BUFFER_SIZE=64*1024    #bytes of command output kept per module, see RingBuffer
+TABLE_ROWS=20                 #module/connection lines shown at once, see Table
+WATCH_INTERVAL=5              #seconds between status polls in watch mode, see Manager.watch()
+WATCH_MIN_INTERVAL=1          #seconds, shortest adapted watch interval
+WATCH_MAX_FACTOR=4            #longest adapted watch interval, times the chosen one
+SUPERVISE_INTERVAL=2          #seconds between checks of the supervised modules, see Supervisor
+RESTART_BACKOFF=1             #seconds before a dead module is restarted, doubled at each restart in a row
+RESTART_MAX_BACKOFF=60        #seconds, longest wait before a restart
+CRASH_LOOP_RESTARTS=5         #restarts within CRASH_LOOP_WINDOW after which a module is given up
+CRASH_LOOP_WINDOW=120         #seconds
+SUPERVISE_HOLD=60             #seconds a module stopped on purpose is left alone while it still runs
 
 ## ensure portable way to kill a process
 ## this works on python < 2.6 (which does not implement
@@ -52,47 +118,971 @@ def portableKill(theprocess):
         ctypes.windll.kernel32.TerminateProcess(handle, -1)
         ctypes.windll.kernel32.CloseHandle(handle)
 
+## What runProcess() returns: exit code, captured output and the
+## wall time spent. A process killed on timeout or cancelled has ret=1.
+## A command not run because its node is unreachable (see NodeBreaker)
+## has unreachable set.
+class ProcessResult:
+    def __init__(self, cmd, ret, out, err, elapsed, timedOut, cancelled=False, unreachable=False):
+        self.cmd=cmd
+        self.ret=ret
+        self.out=out
+        self.err=err
+        self.elapsed=elapsed
+        self.timedOut=timedOut
+        self.cancelled=cancelled
+        self.unreachable=unreachable
+
+## Set to cancel the commands run with it: commands not yet started
+## fail immediately, running ones are killed. The pipe lets
+## runProcess() select() on it together with the child's output.
+class CancelToken:
+    def __init__(self):
+        self.r, self.w=os.pipe()
+        self.flag=False
+        self.lock=threading.Lock()
+
+    def set(self):
+        self.lock.acquire()
+        if not self.flag:
+            self.flag=True
+            os.write(self.w, 'x')
+        self.lock.release()
+
+    def clear(self):
+        self.lock.acquire()
+        if self.flag:
+            self.flag=False
+            os.read(self.r, 1)
+        self.lock.release()
+
+    def isSet(self):
+        return self.flag
+
+    def fileno(self):
+        return self.r
+
+## Run cmd and wait for it without polling: a helper thread blocks in
+## wait() and signals the exit through a pipe, which is select()ed
+## together with the child's stdout/stderr so these are drained as
+## data arrives (a full pipe would otherwise block the child).
+## select() does not work on pipes on windows, there we fall back to
+## one reader thread per pipe.
+## output(data), when given, is called with each chunk the child writes
+## on stdout or stderr as soon as it is read.
+def runProcess(cmd, timeout=PROCESS_TIMEOUT, cancel=None, output=None):
+    start=time.time()
+    if cancel!=None and cancel.isSet():
+        return ProcessResult(cmd, 1, "", "", 0, False, True)
+
+    deadline=start+timeout
+    p=subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    cancelled=False
+    if os.name == 'posix':
+        out, err, timedOut, cancelled=waitPosix(p, deadline, cancel, output)
+    else:
+        out, err, timedOut=waitThreaded(p, deadline, output)
 
-class ModuleData:
-    def __init__(self, name, arguments, node, tag, workdir, ioNode):
-        self.name = name
-        self.parameters = arguments
-        self.node = node
-        self.tag=tag
-        self.stdioNode=ioNode
-        self.workdir=workdir
+    if timedOut or cancelled:
+        ret=1
+    else:
+        ret=p.returncode
 
-class EntryModule:
-    def __init__(self, frame, name, arguments, node, tag, workdir, ioNode):
-        self.entryName=Entry(frame)
-        self.entryName.insert(END, name)
+    return ProcessResult(cmd, ret, out, err, time.time()-start, timedOut, cancelled)
 
-        self.parameters=arguments
+def waitPosix(p, deadline, cancel=None, output=None):
+    wakeR, wakeW=os.pipe()
 
-        self.entryNode=Entry(frame)
-        self.entryNode.insert(END, node)
+    def waiter():
+        p.wait()
+        os.write(wakeW, 'x')
 
-        self.entryTag=Entry(frame)
-        self.entryTag.insert(END, tag)
+    t=threading.Thread(target=waiter)
+    t.setDaemon(True)
+    t.start()
 
-        self.entryIoNode=Entry(frame)
-        self.entryIoNode.insert(END, ioNode)
-        
-        self.hold = IntVar()
-        self.checkHold=Checkbutton(frame, variable=self.hold)
-        self.checkHold.var = self.hold
+    outFd=p.stdout.fileno()
+    errFd=p.stderr.fileno()
+    chunks={outFd:[], errFd:[]}
+    fds=[outFd, errFd]
+    exited=False
+    timedOut=False
+    cancelled=False
 
+    try:
+        while fds or not exited:
+            if exited:
+                # child is gone, only pick up what is left in the
+                # pipes (a grandchild may keep them open)
+                timeout=0
+            else:
+                timeout=deadline-time.time()
+                if timeout<=0:
+                    timedOut=True
+                    break
+
+            watched=list(fds)
+            if not exited:
+                watched.append(wakeR)
+                if cancel!=None:
+                    watched.append(cancel.fileno())
+            r=select.select(watched, [], [], timeout)[0]
+            if exited and not r:
+                break
+
+            if not exited and cancel!=None and cancel.fileno() in r and wakeR not in r:
+                cancelled=True
+                break
+
+            for fd in r:
+                if fd==wakeR:
+                    exited=True
+                    continue
+                data=os.read(fd, PROCESS_READ_SIZE)
+                if data:
+                    chunks[fd].append(data)
+                    if output!=None:
+                        output(data)
+                else:
+                    fds.remove(fd)
 
-        self.runningFlag=False
-        self.update()
+        if timedOut or cancelled:
+            portableKill(p)
+            t.join()
+    finally:
+        os.close(wakeR)
+        os.close(wakeW)
+        p.stdout.close()
+        p.stderr.close()
+
+    return "".join(chunks[outFd]), "".join(chunks[errFd]), timedOut, cancelled
+
+def waitThreaded(p, deadline, output=None):
+    chunks={}
+
+    def reader(name, f):
+        res=[]
+        while True:
+            data=os.read(f.fileno(), PROCESS_READ_SIZE)
+            if not data:
+                break
+            res.append(data)
+            if output!=None:
+                output(data)
+        chunks[name]="".join(res)
+
+    readers=[threading.Thread(target=reader, args=('out', p.stdout)),
+             threading.Thread(target=reader, args=('err', p.stderr))]
+    exited=threading.Event()
+
+    def waiter():
+        p.wait()
+        exited.set()
+
+    waiterThread=threading.Thread(target=waiter)
+    for t in readers+[waiterThread]:
+        t.setDaemon(True)
+        t.start()
+
+    exited.wait(max(0, deadline-time.time()))
+    timedOut=not exited.isSet()
+    if timedOut:
+        portableKill(p)
+        waiterThread.join()
+
+    for t in readers:
+        t.join()
+
+    return chunks.get('out', ""), chunks.get('err', ""), timedOut
+
+## Bounded pool of worker threads used to run yarp/yarprun commands
+## concurrently (python 2 has no concurrent.futures).
+## Workers must never touch Tk widgets: read the values you need
+## before submitting and apply the results from the Tk thread.
+class Job:
+    def __init__(self, fn, args, callback, finished):
+        self.fn=fn
+        self.args=args
+        self.callback=callback
+        self.finished=finished
+        self.result=None
+        self.error=None
+        self.done=threading.Event()
+
+    def run(self):
+        try:
+            self.result=self.fn(*self.args)
+        except Exception, e:
+            self.error=e
+            print "--> Error in worker:", str(e)
+
+        # the callback may submit follow-up jobs to the same group, it
+        # runs before the job is accounted as finished so the group
+        # cannot drain in between
+        if self.callback!=None:
+            try:
+                self.callback(self)
+            except Exception, e:
+                print "--> Error in worker callback:", str(e)
+
+        self.done.set()
+        if self.finished!=None:
+            self.finished(self)
+
+    def wait(self):
+        self.done.wait()
+        return self.result
+
+class WorkerPool:
+    def __init__(self, size):
+        self.size=size
+        self.queue=Queue.Queue()
+        self.threads=[]
+        self.lock=threading.Lock()
+
+    def start(self):
+        self.lock.acquire()
+        try:
+            while len(self.threads)<self.size:
+                t=threading.Thread(target=self.work)
+                t.setDaemon(True)
+                t.start()
+                self.threads.append(t)
+        finally:
+            self.lock.release()
+
+    def work(self):
+        while True:
+            job=self.queue.get()
+            job.run()
+
+    def submit(self, fn, args=(), callback=None, finished=None):
+        self.start()
+        job=Job(fn, args, callback, finished)
+        self.queue.put(job)
+        return job
+
+## A set of jobs we want to wait for as a whole; jobs submitted from
+## callbacks of jobs in the group are waited for as well.
+class JobGroup:
+    def __init__(self, pool):
+        self.pool=pool
+        self.pending=0
+        self.cond=threading.Condition()
+
+    def submit(self, fn, args=(), callback=None):
+        self.cond.acquire()
+        self.pending=self.pending+1
+        self.cond.release()
+        return self.pool.submit(fn, args, callback, self.jobFinished)
+
+    def jobFinished(self, job):
+        self.cond.acquire()
+        self.pending=self.pending-1
+        if self.pending==0:
+            self.cond.notifyAll()
+        self.cond.release()
+
+    # submit in delay seconds, no worker is held meanwhile; the group
+    # is not over before the job is
+    def submitLater(self, delay, fn, args=(), callback=None):
+        self.cond.acquire()
+        self.pending=self.pending+1
+        self.cond.release()
+
+        def submit():
+            self.pool.submit(fn, args, callback, self.jobFinished)
+
+        timer=threading.Timer(delay, submit)
+        timer.setDaemon(True)
+        timer.start()
+
+    def wait(self):
+        self.cond.acquire()
+        while self.pending>0:
+            self.cond.wait()
+        self.cond.release()
+
+## Run fn(item) for every item on its own thread and return the results
+## in order. Used to fan out across applications: each of them submits
+## its own work to the shared pool and waits for it, so this outer level
+## must not take workers from that pool.
+def fanOut(fn, items):
+    results=[None]*len(items)
+
+    def work(i):
+        try:
+            results[i]=fn(items[i])
+        except Exception, e:
+            print "--> Error in worker:", str(e)
+
+    threads=[]
+    for i in range(len(items)):
+        t=threading.Thread(target=work, args=(i,))
+        t.setDaemon(True)
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+    return results
+
+## Recently seen status of modules ("module", node, tag), ports
+## ("port", name) and connections ("conn", from, to). A value is reused
+## for ttl seconds unless invalidated by a command that changes it;
+## concurrent get()s of the same key share a single fetch. Results
+## fetched while cancel is set are not stored.
+class StatusCache:
+    def __init__(self, ttl, cancel=None):
+        self.ttl=ttl
+        self.cancel=cancel
+        self.entries={}
+        self.inflight={}
+        self.lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.coalesced=0
+        # bumped by invalidate(), a fetch that started before that
+        # may have seen the old state and is not stored
+        self.generation=0
+
+    def fresh(self, key):
+        entry=self.entries.get(key)
+        return entry!=None and time.time()-entry[1]<=self.ttl
+
+    def has(self, key):
+        self.lock.acquire()
+        res=self.fresh(key)
+        self.lock.release()
+        return res
+
+    def get(self, key, fetch):
+        self.lock.acquire()
+        if self.fresh(key):
+            self.hits=self.hits+1
+            value=self.entries[key][0]
+            self.lock.release()
+            return value
+
+        pending=self.inflight.get(key)
+        if pending!=None:
+            self.coalesced=self.coalesced+1
+            self.lock.release()
+            pending.wait()
+            return pending.value
+
+        self.misses=self.misses+1
+        pending=threading.Event()
+        pending.value=None
+        self.inflight[key]=pending
+        generation=self.generation
+        self.lock.release()
+
+        fetched=False
+        try:
+            pending.value=fetch()
+            fetched=True
+        finally:
+            self.lock.acquire()
+            del self.inflight[key]
+            cancelled=(self.cancel!=None and self.cancel.isSet())
+            if fetched and generation==self.generation and not cancelled:
+                self.entries[key]=(pending.value, time.time())
+            self.lock.release()
+            pending.set()
+
+        return pending.value
+
+    # generation is that of when the value was fetched (see get()), it
+    # is not stored if invalidate() was called since
+    def put(self, key, value, generation=None):
+        self.lock.acquire()
+        if generation==None or generation==self.generation:
+            self.entries[key]=(value, time.time())
+        self.lock.release()
+
+    # drop one key, or every key of the given kinds
+    def invalidate(self, key=None, kinds=()):
+        self.lock.acquire()
+        self.generation=self.generation+1
+        if key!=None and key in self.entries:
+            del self.entries[key]
+        for k in self.entries.keys():
+            if k[0] in kinds:
+                del self.entries[k]
+        self.lock.release()
+
+    def stats(self):
+        return {'hits':self.hits, 'misses':self.misses, 'coalesced':self.coalesced}
+
+## Snapshot of the ports registered on the name server, taken with a
+## single "yarp name list" and used to answer all the existence checks
+## of one refresh cycle. If the bulk query fails every check falls
+## back to its own "yarp exists".
+## Note the snapshot only tells whether a port is registered, unlike
+## "yarp exists" it does not contact the port itself.
+## The snapshot is taken the first time it is needed, answers found
+## in cache (a StatusCache) do not need it at all.
+## With a name server client (names, see yarpclient.py) the listing and
+## the single checks are asked directly to the name server, falling
+## back to the yarp binary if that fails.
+class PortRegistry:
+    def __init__(self, spawn, run, cache=None, names=None):
+        self.spawn=spawn
+        self.run=run
+        self.cache=cache
+        self.names=names
+        self.ports=None
+        self.fetched=False
+        self.lock=threading.Lock()
+
+    def snapshot(self):
+        self.lock.acquire()
+        try:
+            if not self.fetched:
+                self.refresh()
+            return self.ports!=None
+        finally:
+            self.lock.release()
+
+    def refresh(self):
+        self.fetched=True
+        self.ports=None
+        if self.names!=None:
+            try:
+                self.ports=set(self.names.list())
+                return True
+            except yarpclient.NameClientError, e:
+                print "--> Name server client:", str(e)
+
+        result=self.run(['yarp', 'name', 'list'])
+        if result.ret!=0:
+            print "--> Could not list ports on the name server, checking them one by one"
+            return False
+
+        ports=set()
+        for line in result.out.splitlines():
+            v=line.split()
+            # registration name /port ip 10.0.0.1 port 10002 type tcp
+            if len(v)>=5 and v[0]=="registration" and v[1]=="name":
+                if v[4]!="none":
+                    ports.add(v[2])
+
+        self.ports=ports
+        return True
+
+    def lookup(self, port):
+        if self.snapshot():
+            return port in self.ports
+        if self.names!=None:
+            try:
+                return self.names.exists(port)
+            except yarpclient.NameClientError, e:
+                print "--> Name server client:", str(e)
+        return self.spawn(['yarp', 'exists', port])==0
+
+    def exists(self, port):
+        if self.cache!=None:
+            return self.cache.get(('port', port), lambda: self.lookup(port))
+        return self.lookup(port)
+
+    # check a list of ports, concurrently on pool if neither the cache
+    # nor the snapshot know them; returns a dictionary port name -> exists
+    def existsMany(self, names, pool):
+        flags={}
+        jobs=[]
+        for name in set(names):
+            if (self.cache!=None and self.cache.has(('port', name))) or self.snapshot():
+                flags[name]=self.exists(name)
+            else:
+                jobs.append(pool.submit(self.exists, (name,)))
+
+        for job in jobs:
+            flags[job.args[0]]=(job.wait()==True)
+        return flags
+
+## Snapshot of the processes run by the yarprun servers, one
+## "yarprun --on /node --ps" per node (all nodes concurrently) answers
+## the status of every module on that node. A node whose --ps fails
+## is checked module by module with --isrunning, unless the query
+## timed out or the node is known to be unreachable: then nothing is
+## running there.
+class ProcessTable:
+    # yarprun --ps prints a line per process:
+    # (pid 1234) (tag mytag) (status running) (cmd "...") (env "...")
+    tagRe=re.compile(r'\(tag\s+"?([^")]*)"?\)')
+    statusRe=re.compile(r'\(status\s+"?([^")]*)"?\)')
+
+    def __init__(self, spawn, run):
+        self.spawn=spawn
+        self.run=run
+        self.tables={}
+
+    def fetch(self, node):
+        result=self.run(['yarprun', '--on', '/'+node, '--ps'])
+        if result.timedOut or result.unreachable:
+            print "--> Node", node, "did not answer, considering it unreachable"
+            return set()
+        if result.ret!=0:
+            return None
+
+        tags=set()
+        for line in result.out.splitlines():
+            tag=self.tagRe.search(line)
+            if tag==None:
+                continue
+            status=self.statusRe.search(line)
+            if status==None or status.group(1)=="running":
+                tags.add(tag.group(1))
+        return tags
+
+    def refresh(self, nodes, pool):
+        self.tables={}
+        jobs=[]
+        for node in set(nodes):
+            jobs.append(pool.submit(self.fetch, (node,)))
+        for job in jobs:
+            self.tables[job.args[0]]=job.wait()
+
+    def isRunning(self, node, tag):
+        table=self.tables.get(node)
+        if table!=None:
+            return tag in table
+        cmd=['yarprun', '--on','/'+node,'--isrunning', tag]
+        return self.spawn(cmd)==0
+
+    # modules is a list of (node, tag), returns a list of flags;
+    # modules on nodes without a table are checked on pool
+    def runningMany(self, modules, pool):
+        self.refresh([node for node, tag in modules], pool)
+        jobs=[]
+        for node, tag in modules:
+            jobs.append(pool.submit(self.isRunning, (node, tag)))
+        return [job.wait()==True for job in jobs]
+
+## Checks output ports, input ports and connections concurrently.
+## Every distinct port is checked once, the check of a connection is
+## scheduled as soon as both its ends are known to exist.
+class ConnectionChecker:
+    def __init__(self, pool, spawn, registry, cache=None):
+        self.pool=pool
+        self.spawn=spawn
+        self.registry=registry
+        self.cache=cache
+        self.lock=threading.Lock()
+
+    def portExists(self, port):
+        return self.registry.exists(port)
+
+    def connectionExists(self, output, input):
+        def fetch():
+            cmd=['yarp', 'exists', output, input]
+            print cmd
+            return self.spawn(cmd)==0
+
+        if self.cache!=None:
+            return self.cache.get(('conn', output, input), fetch)
+        return fetch()
+
+    # pairs is a list of (output, input) port names, returns two
+    # dictionaries: port name -> exists, (output, input) -> connected
+    def check(self, pairs):
+        ports={}
+        connected={}
+        waiting={}
+        missing={}
+
+        for pair in pairs:
+            connected[pair]=False
+            missing[pair]=len(set(pair))
+            for p in set(pair):
+                waiting.setdefault(p, []).append(pair)
+
+        group=JobGroup(self.pool)
+
+        def portDone(job):
+            port=job.args[0]
+            ready=[]
+            self.lock.acquire()
+            try:
+                ports[port]=(job.result==True)
+                for pair in waiting[port]:
+                    missing[pair]=missing[pair]-1
+                    if missing[pair]==0 and ports[pair[0]] and ports[pair[1]]:
+                        ready.append(pair)
+            finally:
+                self.lock.release()
+
+            for pair in ready:
+                group.submit(self.connectionExists, pair, connDone)
+
+        def connDone(job):
+            self.lock.acquire()
+            connected[job.args]=(job.result==True)
+            self.lock.release()
+
+        for port in waiting.keys():
+            group.submit(self.portExists, (port,), portDone)
+
+        group.wait()
+        return ports, connected
+
+## Connects (or disconnects) many port pairs at once. A single status
+## snapshot (see ConnectionChecker) decides what has to be done: the
+## missing connections whose ports both exist are connected, the
+## present ones disconnected, the others are left alone. At most
+## self.limit connections are in progress at a time, a command that
+## fails is retried up to CONNECT_RETRIES times, CONNECT_RETRY_DELAY
+## apart (doubling, see JobGroup.submitLater); afterwards only the
+## connections operated on are checked again.
+class BulkConnector:
+    def __init__(self, pool, run, checker, cache, limit):
+        self.pool=pool
+        self.run=run
+        self.checker=checker
+        self.cache=cache
+        self.limit=limit
+        self.lock=threading.Lock()
+
+    def command(self, conn, connect):
+        output, input, protocol=conn
+        if connect:
+            return ['yarp', 'connect', output, input, protocol]
+        return ['yarp', 'disconnect', output, input]
+
+    # conns is a list of (output, input, protocol), returns a list of
+    # (exit code or None if nothing was done, seconds) and the status
+    # as ConnectionChecker.check() does
+    def apply(self, conns, connect):
+        pairs=[(c[0], c[1]) for c in conns]
+        ports, connected=self.checker.check(pairs)
+
+        todo=[]
+        planned=set()
+        for i in range(len(conns)):
+            output, input=pairs[i]
+            if ports[output] and ports[input] and connected[pairs[i]]!=connect and not pairs[i] in planned:
+                todo.append(i)
+                planned.add(pairs[i])
+        print "--", len(todo), "of", len(conns), "connections to change"
+
+        results=[(None, 0)]*len(conns)
+        started={}
+        waiting=list(todo)
+        group=JobGroup(self.pool)
+
+        # one command, attempt number tries
+        def attempt(i, tries):
+            if tries==0:
+                started[i]=time.time()
+            return self.run(self.command(conns[i], connect))
+
+        # keep self.limit connections in progress (those waiting for a
+        # retry included): each one that is over submits the next
+        def done(job):
+            i, tries=job.args
+            result=job.result
+            if result!=None and result.ret!=0 and not (result.cancelled or result.timedOut) and tries<CONNECT_RETRIES:
+                print "--> Retrying", " ".join(self.command(conns[i], connect))
+                group.submitLater(CONNECT_RETRY_DELAY*2**tries, attempt, (i, tries+1), done)
+                return
+
+            self.cache.invalidate(('conn', conns[i][0], conns[i][1]))
+            ret=1
+            if result!=None:
+                ret=result.ret
+            results[i]=(ret, time.time()-started[i])
+            submitNext()
+
+        def submitNext():
+            self.lock.acquire()
+            i=None
+            if waiting:
+                i=waiting.pop(0)
+            self.lock.release()
+            if i!=None:
+                group.submit(attempt, (i, 0), done)
+
+        for k in range(min(self.limit, len(todo))):
+            submitNext()
+        group.wait()
+
+        # check again what was changed only
+        def verified(job):
+            self.lock.acquire()
+            connected[job.args]=(job.result==True)
+            self.lock.release()
+
+        for pair in planned:
+            group.submit(self.checker.connectionExists, pair, verified)
+        group.wait()
+        return results, (ports, connected)
+
+
+## Launch scheduling: a module whose input port is fed by another
+## module is started after it. Ports are matched to the module owning
+## them by name prefix (the --name parameter, the tag or the module
+## name); a <module depends="tag1 tag2"> attribute adds explicit
+## dependencies on other modules' tags.
+class LaunchScheduler:
+    def __init__(self, pool, limit):
+        self.pool=pool
+        self.limit=limit
+
+    def prefixes(self, mod):
+        res=['/'+mod.tag, '/'+mod.name.split('/')[-1]]
+        v=mod.parameters.split()
+        for i in range(len(v)-1):
+            if v[i]=='--name' and v[i+1].startswith('/'):
+                res.append(v[i+1])
+        return res
+
+    def owner(self, port, owners):
+        best=None
+        bestLen=0
+        for prefix, mod in owners:
+            if port==prefix or port.startswith(prefix+'/'):
+                if len(prefix)>bestLen:
+                    best=mod
+                    bestLen=len(prefix)
+        return best
+
+    # modules is a list of ModuleData, connections a list of
+    # (output, input) port names; returns a dictionary
+    # tag -> set of tags that must be started first
+    def dependencies(self, modules, connections):
+        owners=[]
+        deps={}
+        for mod in modules:
+            deps[mod.tag]=set()
+            for prefix in self.prefixes(mod):
+                owners.append((prefix, mod.tag))
+
+        for output, input in connections:
+            producer=self.owner(output, owners)
+            consumer=self.owner(input, owners)
+            if producer!=None and consumer!=None and producer!=consumer:
+                deps[consumer].add(producer)
+
+        for mod in modules:
+            for tag in mod.depends:
+                if tag in deps and tag!=mod.tag:
+                    deps[mod.tag].add(tag)
+                else:
+                    print "WARNING: module", mod.tag, "depends on unknown module", tag
+
+        return deps
+
+    # group modules in waves, every module only depends on modules of
+    # earlier waves or on modules already running
+    def waves(self, modules, deps, running):
+        left=[mod.tag for mod in modules if mod.tag not in running]
+        done=set(running)
+        waves=[]
+        while left:
+            wave=[tag for tag in left if deps[tag]<=done]
+            if not wave:
+                print "WARNING: circular dependency among", " ".join(left), "starting them together"
+                wave=left
+            waves.append(wave)
+            done.update(wave)
+            left=[tag for tag in left if tag not in done]
+        return waves
+
+    # start modules wave after wave, launch(mod) is run on the pool
+    # for each module not in running, at most self.limit at a time
+    def run(self, modules, connections, launch, running=()):
+        byTag={}
+        for mod in modules:
+            byTag[mod.tag]=mod
+
+        deps=self.dependencies(modules, connections)
+        waves=self.waves(modules, deps, running)
+
+        durations={}
+        lock=threading.Lock()
+        start=time.time()
+
+        def timed(mod):
+            t=time.time()
+            launch(mod)
+            return time.time()-t
+
+        for wave in waves:
+            group=JobGroup(self.pool)
+            queue=list(wave)
+
+            def launched(job):
+                lock.acquire()
+                durations[job.args[0].tag]=job.result or 0
+                nextTag=None
+                if queue:
+                    nextTag=queue.pop(0)
+                lock.release()
+                if nextTag!=None:
+                    group.submit(timed, (byTag[nextTag],), launched)
+
+            lock.acquire()
+            first=queue[:self.limit]
+            del queue[:self.limit]
+            lock.release()
+            for tag in first:
+                group.submit(timed, (byTag[tag],), launched)
+            group.wait()
+
+        self.report(waves, deps, durations, time.time()-start)
+        return durations
+
+    def report(self, waves, deps, durations, elapsed):
+        # longest chain of launches that had to happen one after the other
+        path={}
+        def chain(tag):
+            if tag not in path:
+                path[tag]=0
+                before=[chain(d) for d in deps[tag]]
+                path[tag]=durations.get(tag, 0)+max(before+[0])
+            return path[tag]
+
+        critical=0
+        for tag in deps.keys():
+            critical=max(critical, chain(tag))
+
+        print "-- Started", len(durations), "modules in", len(waves), "waves",
+        print "in %.2fs (critical path %.2fs)" % (elapsed, critical)
+        return critical
 
+class ModuleData:
+    def __init__(self, name, arguments, node, tag, workdir, ioNode, depends=None):
+        self.name = name
+        self.parameters = arguments
+        self.node = node
+        self.tag=tag
+        self.stdioNode=ioNode
         self.workdir=workdir
+        self.hold=False
+        if depends==None:
+            depends=[]
+        self.depends=depends
+        # pre-built yarprun command lines, see loadDescriptor
+        self.runCmd=None
+        self.runCmdHold=None
+
+    def sameLaunch(self, other):
+        return (self.name, self.parameters, self.node, self.tag, self.workdir, self.stdioNode.replace("none", "")) == \
+               (other.name, other.parameters, other.node, other.tag, other.workdir, other.stdioNode.replace("none", ""))
+
+    def startCmd(self):
+        if self.hold:
+            cmd=self.runCmdHold
+        else:
+            cmd=self.runCmd
+
+        if cmd==None:
+            hold = ""
+            if (self.hold):
+                hold = "--hold"
+            return buildRunCmd(self.name, self.parameters, self.node, self.tag, self.stdioNode, hold, self.workdir)
+        return list(cmd)
+
+## yarprun command line to start a module, hold is "--hold" or ""
+def buildRunCmd(name, parameters, node, tag, stdioNode, hold, workdir):
+    if (stdioNode == "none" or stdioNode == ""):
+        if(workdir == ""):
+            cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag]
+        else:
+            cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--workdir',workdir]
+    else:
+        if(workdir == ""):
+            cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--stdio', '/'+stdioNode, hold]
+        else:
+            cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--stdio', '/'+stdioNode, hold, '--workdir',workdir]
+    return cmd
+
+## The rows of an application panel are its model: plain records that
+## workers change from any thread through Model.update(), which bumps
+## the version of the record and of the model. The views (Table, the
+## dependency list) are synced from the model on the Tk thread every
+## UI_UPDATE_INTERVAL and only redraw the records whose version changed.
+class Model:
+    def __init__(self, records):
+        self.records=records
+        self.version=0
+        self.lock=threading.Lock()
+
+    # set the given fields of record, returns whether any changed
+    def update(self, record, **values):
+        self.lock.acquire()
+        changed=False
+        for key, value in values.items():
+            if getattr(record, key)!=value:
+                setattr(record, key, value)
+                changed=True
+        if changed:
+            record.version=record.version+1
+            self.version=self.version+1
+        self.lock.release()
+        return changed
+
+class Record(object):
+    __slots__=('version',)
 
-    def update(self):
+    def __init__(self):
+        self.version=0
+
+## Module record: the values shown (and edited) in the module table and
+## the last known status
+class ModuleRow(Record):
+    __slots__=('name', 'parameters', 'node', 'tag', 'workdir', 'stdioNode', 'depends',
+               'hold', 'runningFlag', 'data')
+
+    def __init__(self, data):
+        Record.__init__(self)
+        self.name=data.name
+        self.parameters=data.parameters
+        self.node=data.node
+        self.tag=data.tag
+        self.workdir=data.workdir
+        self.stdioNode=data.stdioNode
+        if self.stdioNode=="":
+            self.stdioNode="none"
+        self.depends=data.depends
+        self.hold=0
+        # None until the first check
+        self.runningFlag=None
+        # ModuleData the row was created from
+        self.data=data
+
+    # current values of the row, safe to hand over to worker threads
+    def getData(self):
+        data=ModuleData(self.name, self.parameters, self.node, self.tag,
+                        self.workdir, self.stdioNode, self.depends)
+        data.hold=(self.hold!=0)
+        if data.sameLaunch(self.data):
+            data.runCmd=self.data.runCmd
+            data.runCmdHold=self.data.runCmdHold
+        return data
+
+    def status(self):
+        if self.runningFlag==None:
+            return "unknown"
         if self.runningFlag:
-            self.entryName.config(foreground="#00A000")
-        else:
-            self.entryName.config(foreground="#A00000")
+            return "running"
+        return "stopped"
+
+    # foreground of the entry of a column, None to leave it alone
+    def color(self, key):
+        if key=="name":
+            return flagColor(self.runningFlag)
+        return None
+
+# grey for a status not known yet (None), then green or red
+def flagColor(flag):
+    if flag==None:
+        return "#808080"
+    if flag:
+        return "#00A000"
+    return "#A00000"
 
 class Connection:
     def __init__(self, input, output, protocol):
@@ -100,60 +1090,79 @@ class Connection:
         self.output=output
         self.protocol=protocol
 
+## Dependency record, a port or (kind "node") a node that must be there
+class DependencyRow(Record):
+    __slots__=('name', 'kind', 'flag')
+
+    def __init__(self, name, kind):
+        Record.__init__(self)
+        self.name=name
+        self.kind=kind
+        # None until the first check
+        self.flag=None
+
+    # what to look for in the name server
+    def port(self):
+        if self.kind=="node":
+            return '/'+self.name
+        return self.name
+
+## Widgets of a dependency, synced from its record by App.sync()
 class EntryDependency:
-    def __init__(self, frame, name):
+    def __init__(self, frame, row):
+        self.row=row
+        self.version=None
         self.entry=Entry(frame)
-        self.entry.insert(END, name)
+        self.entry.insert(END, row.name)
         self.flag=IntVar()
         self.check=Checkbutton(frame, variable=self.flag)
         self.check.config(state=DISABLED,disabledforeground="#00A000")
         self.check.var=self.flag
 
-class EntryConnection:
-    def __init__(self, frame, outputP, inputP, protocol):
-        self.inEntry=Entry(frame)
-        self.inEntry.insert(END, inputP)
-        self.inFlag=IntVar()
-        self.inCheck=Checkbutton(frame, variable=self.inFlag)
-        self.inCheck.var=self.inFlag
-
-        self.outEntry=Entry(frame)
-        self.outEntry.insert(END, outputP)
-        self.outFlag=IntVar()
-        self.outCheck=Checkbutton(frame, variable=self.outFlag)
-        self.outCheck.var=self.outFlag
+## Connection record, see ModuleRow
+class ConnectionRow(Record):
+    __slots__=('output', 'input', 'protocol', 'outFlag', 'inFlag', 'connFlag')
 
-        self.protEntry=Entry(frame)
-        self.protEntry.insert(END, protocol)
-        self.connFlag=IntVar()
-
-        self.connCheck=Checkbutton(frame, variable=self.connFlag)
-        self.connCheck.config(state=DISABLED,disabledforeground="#00A000")
-        self.connCheck.var=self.connFlag
-
-        self.update()
-
-    def update(self):
-        if self.inFlag.get():
-            self.inEntry.config(foreground="#00A000")
-        else:
-            self.inEntry.config(foreground="#A00000")
-
-        if self.outFlag.get():
-            self.outEntry.config(foreground="#00A000")
-        else:
-            self.outEntry.config(foreground="#A00000")
+    def __init__(self, output, input, protocol):
+        Record.__init__(self)
+        self.output=output
+        self.input=input
+        self.protocol=protocol
+        # None until the first check
+        self.outFlag=None
+        self.inFlag=None
+        self.connFlag=None
+
+    def status(self):
+        if self.connFlag==None:
+            return "unknown"
+        if self.connFlag:
+            return "connected"
+        if self.outFlag and self.inFlag:
+            return "disconnected"
+        return "missing ports"
+
+    # each port is green if it is there, see ModuleRow.color()
+    def color(self, key):
+        if key=="output":
+            return flagColor(self.outFlag)
+        if key=="input":
+            return flagColor(self.inFlag)
+        return None
 
 class Dependencies:
-    ports=[]
-    nodes=[]
+    def __init__(self):
+        self.ports=[]
+        self.nodes=[]
 
 class AppData:
-    dependencies=Dependencies()
-
     def __init__(self):
+        self.dependencies=Dependencies()
         self.modules=[]
         self.connections=[]
+        # see Limiter
+        self.maxProcesses=None
+        self.limits={}
 
     def setName(self, name):
         self.name = name
@@ -175,12 +1184,12 @@ class AppData:
         self.dependencies.nodes.append(node)
         self.dependencies.nodes=list(set(self.dependencies.nodes))
 
-    def pushModuleDetached(self, module, arguments, node, tag, workdir):
-        nm=ModuleData(module, arguments, node, tag, workdir, "")
+    def pushModuleDetached(self, module, arguments, node, tag, workdir, depends=None):
+        nm=ModuleData(module, arguments, node, tag, workdir, "", depends)
         self.modules.append(nm)
 
-    def pushModuleWithConsole(self, module, arguments, node, tag, workdir, stdioNode):
-        nm=ModuleData(module, arguments, node, tag, workdir, stdioNode)
+    def pushModuleWithConsole(self, module, arguments, node, tag, workdir, stdioNode, depends=None):
+        nm=ModuleData(module, arguments, node, tag, workdir, stdioNode, depends)
         self.modules.append(nm)
 
     def pushConnection(self, output, input, prot):
@@ -221,6 +1230,1471 @@ class AppData:
 
         log.write("------------\n")
 
+## Application descriptors are compiled once into plain tuples, with
+## the yarprun command lines already built, and the result is cached
+## (with marshal, plain data only) in a directory of the user,
+## $TMP/manager-cache-<uid>, keyed by path, modification time and md5
+## of the file. The parse is a single streaming pass (iterparse) that
+## drops every <module>/<connection> element once handled. Warnings
+## found while compiling are cached too and shown again at every load.
+##   application: (name, ports, nodes, modules, connections)
+##   module: (name, parameters, node, tag, workdir, stdio, depends, runCmd, runCmdHold)
+##   connection: (output, input, protocol)
+DESCRIPTOR_CACHE_VERSION=3
+
+def childText(elem, tag):
+    child=elem.find(tag)
+    if child==None:
+        return None
+    if child.text==None:
+        return ""
+    return child.text
+
+def compileModule(mod, warnings):
+    name=childText(mod, "name")
+    node=childText(mod, "node")
+
+    #protect against nodes whose names start with /
+    if (node[0]=='/'):
+        warnings.append("WARNING: <node> entry should NOT contain trailing '/'")
+        node=node[1:]
+
+    tag=childText(mod, "tag")
+
+    parameters=childText(mod, "parameters")
+    #allow empty sections
+    if parameters==None or parameters=="":
+        parameters=""
+    else:
+        # wanr about wrapping parameters with ""
+        if (parameters[0]=="\""):
+            warnings.append("WARNING: detected parameter list starting with \" (are you wrapping parameters with \"\"?)")
+            parameters=parameters[1:]
+        if (parameters[len(parameters)-1]=="\""):
+            warnings.append("WARNING: detected parameter list ending with \" (are you wrapping parameters with \"\"?)")
+            parameters=parameters[:len(parameters)-2]
+
+        # warn about use of ""
+        if (parameters=="\"\""):
+           warnings.append("WARNING: do not use empty parameter list \"\"")
+           parameters=""
+
+    workdir=childText(mod, "workdir")
+    if workdir==None:
+        workdir=""
+
+    stdio=childText(mod, "stdio")
+    if stdio==None:
+        stdio=""
+
+    # optional explicit launch dependencies, tags of modules
+    # that must be started before this one
+    depends=tuple(mod.get("depends", "").replace(',', ' ').split())
+
+    runCmd=tuple(buildRunCmd(name, parameters, node, tag, stdio, "", workdir))
+    runCmdHold=tuple(buildRunCmd(name, parameters, node, tag, stdio, "--hold", workdir))
+    return (name, parameters, node, tag, workdir, stdio, depends, runCmd, runCmdHold)
+
+def compileConnection(c, warnings):
+    input=childText(c, "input")
+    if (input != None):
+        warnings.append("WARNING: found obsolete tag <input>, please use <to> instead")
+    else:
+        input=childText(c, "to")
+
+    output=childText(c, "output")
+    if (output != None):
+        warnings.append("WARNING: found obsolete tag <output>, please use <from> instead")
+    else:
+        output=childText(c, "from")
+
+    protocol=childText(c, "protocol")
+    if (protocol == None):
+        protocol="tcp"
+    return (output, input, protocol)
+
+# returns (applications, warnings)
+def compileDescriptor(f):
+    applications=[]
+    warnings=[]
+    stack=[]
+    for event, elem in ElementTree.iterparse(f, events=("start", "end")):
+        if event=="start":
+            stack.append(elem.tag)
+            if elem.tag=="application":
+                name=None
+                maxProcesses=None
+                limits={}
+                ports=[]
+                nodes=[]
+                modules=[]
+                connections=[]
+            continue
+
+        stack.pop()
+        parent=None
+        if stack:
+            parent=stack[-1]
+
+        if elem.tag=="name" and parent=="application":
+            name=elem.text
+        elif elem.tag=="port" and parent=="dependencies" and stack[-2:-1]==["application"]:
+            ports.append(elem.text)
+        elif elem.tag=="module" and parent=="application":
+            mod=compileModule(elem, warnings)
+            nodes.append(mod[2])
+            if mod[5]!="":
+                nodes.append(mod[5])
+            modules.append(mod)
+            elem.clear()
+        elif elem.tag=="connection" and parent=="application":
+            connections.append(compileConnection(elem, warnings))
+            elem.clear()
+        elif elem.tag=="node" and parent=="limits":
+            limits.setdefault(elem.get("name"), {}).update(parseLimits(dict(elem.items()), "<limits>", warnings))
+        elif elem.tag=="limits" and parent=="application":
+            maxProcesses=parseMaxProcesses(elem.get("maxProcesses"), "<limits>", warnings)
+        elif elem.tag=="application":
+            applications.append((name, tuple(ports), tuple(nodes), tuple(modules), tuple(connections),
+                                 (maxProcesses, limits)))
+            elem.clear()
+
+    return applications, warnings
+
+# the cache directory of the user, created private; a directory that
+# someone else owns or can write to is not used
+def descriptorCacheDir():
+    tmpPath=os.getenv("TMP")
+    if (tmpPath==None):
+        tmpPath="/tmp"
+    if not hasattr(os, "getuid"):
+        # windows, $TMP is per user already
+        return os.path.join(tmpPath, "manager-cache")
+
+    cacheDir=os.path.join(tmpPath, "manager-cache-%d" % os.getuid())
+    try:
+        os.mkdir(cacheDir, 0700)
+    except OSError:
+        pass
+    info=os.lstat(cacheDir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid!=os.getuid() or info.st_mode & 077:
+        raise OSError("%s is not a private directory of the user" % cacheDir)
+    return cacheDir
+
+def descriptorCachePath(path):
+    name=hashlib.md5(os.path.abspath(path)).hexdigest()+".cache"
+    return os.path.join(descriptorCacheDir(), name)
+
+def loadDescriptor(path):
+    content=open(path, "rb").read()
+    key=(DESCRIPTOR_CACHE_VERSION, os.path.abspath(path),
+         os.stat(path).st_mtime, hashlib.md5(content).hexdigest())
+
+    try:
+        cacheFile=descriptorCachePath(path)
+    except OSError, e:
+        print "WARNING: not caching compiled descriptor:", str(e)
+        cacheFile=None
+
+    applications=None
+    if cacheFile!=None:
+        try:
+            f=open(cacheFile, "rb")
+            try:
+                cachedKey, cachedApplications, warnings=marshal.load(f)
+            finally:
+                f.close()
+            if cachedKey==key:
+                applications=cachedApplications
+        except Exception:
+            pass
+
+    if applications==None:
+        applications, warnings=compileDescriptor(StringIO.StringIO(content))
+
+        if cacheFile!=None:
+            try:
+                tmpFile=cacheFile+".%d" % os.getpid()
+                f=open(tmpFile, "wb")
+                marshal.dump((key, applications, warnings), f)
+                f.close()
+                os.rename(tmpFile, cacheFile)
+            except (IOError, OSError, ValueError), e:
+                print "WARNING: could not cache compiled descriptor:", str(e)
+
+    for text in warnings:
+        print text
+    return applications
+
+def loadApplications(path):
+    applicationList=[]
+    for name, ports, nodes, modules, connections, limits in loadDescriptor(path):
+        napp=AppData();
+        print "Application ", name
+        napp.setName(name)
+        napp.maxProcesses, napp.limits=limits
+
+        for p in ports:
+            napp.pushPortDependency(p)
+        for n in nodes:
+            napp.pushNodeDependency(n)
+
+        for name, parameters, node, tag, workdir, stdio, depends, runCmd, runCmdHold in modules:
+            if stdio!="":
+                napp.pushModuleWithConsole(name, parameters, node, tag, workdir, stdio, list(depends))
+            else:
+                napp.pushModuleDetached(name, parameters, node, tag, workdir, list(depends))
+            napp.modules[-1].runCmd=runCmd
+            napp.modules[-1].runCmdHold=runCmdHold
+
+        for output, input, protocol in connections:
+            napp.pushConnection(output, input, protocol)
+
+        # getting temp directory
+        tmpPath  = os.getenv("TMP");
+        if (tmpPath==None):
+            tmpPath="/tmp"
+
+        logfilename=tmpPath+"/"+napp.getName()+".log"
+        napp.setLogFilename(logfilename)
+        applicationList.append(napp)
+
+    return applicationList
+
+## What a command is about: (kind, node, tag), kind is the program and
+## its action, e.g. "yarprun --cmd" or "yarp exists"; node and tag are
+## None when they do not apply
+def commandInfo(cmd):
+    kind=os.path.basename(cmd[0])
+    node=None
+    tag=None
+    for i in range(1, len(cmd)):
+        arg=cmd[i]
+        value=None
+        if i+1<len(cmd):
+            value=cmd[i+1]
+
+        if kind=="yarp" and i==1:
+            kind=kind+" "+arg
+            if arg=="name" and value!=None:
+                kind=kind+" "+value
+        elif arg=="--on" and value!=None:
+            node=value.lstrip('/')
+        elif arg in ("--cmd", "--isrunning", "--sigterm", "--kill", "--ps"):
+            kind=kind+" "+arg
+            if arg in ("--isrunning", "--sigterm", "--kill"):
+                tag=value
+        elif arg=="--as":
+            tag=value
+    return kind, node, tag
+
+## Operation log, one JSON object per line. Records are queued by
+## write() and written by a background thread, in batches, so that
+## logging never blocks on the disk; the file is flushed at least every
+## LOG_FLUSH_INTERVAL and once it grows past maxSize it is rotated to
+## name.1 ... name.<backups>.
+class OperationLog:
+    def __init__(self, filename, maxSize=LOG_MAX_SIZE, backups=LOG_BACKUPS):
+        self.filename=filename
+        self.maxSize=maxSize
+        self.backups=backups
+        self.queue=Queue.Queue()
+        self.file=None
+        self.open()
+
+        self.thread=threading.Thread(target=self.work)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def open(self):
+        try:
+            self.file=open(self.filename, "a")
+        except IOError, e:
+            print "--> Error cannot open log file", self.filename, str(e)
+            self.file=None
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups-1, 0, -1):
+            old="%s.%d" % (self.filename, i)
+            if os.path.exists(old):
+                os.rename(old, "%s.%d" % (self.filename, i+1))
+        if self.backups>0:
+            os.rename(self.filename, self.filename+".1")
+        else:
+            os.remove(self.filename)
+        self.open()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def work(self):
+        closing=False
+        while not closing:
+            try:
+                records=[self.queue.get(True, LOG_FLUSH_INTERVAL)]
+            except Queue.Empty:
+                continue
+
+            # take whatever else is already waiting
+            while True:
+                try:
+                    records.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            if None in records:
+                closing=True
+                records=[r for r in records if r!=None]
+
+            if self.file==None:
+                continue
+
+            try:
+                for record in records:
+                    self.file.write(json.dumps(record, sort_keys=True)+"\n")
+                    if self.file.tell()>self.maxSize:
+                        self.rotate()
+                self.file.flush()
+            except (IOError, OSError), e:
+                print "--> Error writing log file", self.filename, str(e)
+
+        if self.file!=None:
+            self.file.close()
+
+    # write what is queued and stop the writer
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+## Latency of the yarp/yarprun commands, by kind of command (see
+## commandInfo) and by node: a histogram over LATENCY_BUCKETS, count,
+## total and worst time, timeouts, failed requests (see add()) and
+## commands currently in flight.
+class Metrics:
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.byKind={}
+        self.byNode={}
+
+    def entries(self, kind, node):
+        res=[self.byKind.setdefault(kind, MetricsEntry())]
+        if node!=None:
+            res.append(self.byNode.setdefault(node, MetricsEntry()))
+        return res
+
+    def started(self, kind, node):
+        self.lock.acquire()
+        for entry in self.entries(kind, node):
+            entry.inflight=entry.inflight+1
+        self.lock.release()
+
+    def finished(self, kind, node, elapsed, timedOut, failed=False):
+        self.lock.acquire()
+        for entry in self.entries(kind, node):
+            entry.inflight=entry.inflight-1
+            entry.add(elapsed, timedOut, failed)
+        self.lock.release()
+
+    # a request that was not a command, e.g. to the name server
+    def add(self, kind, elapsed, failed):
+        self.started(kind, None)
+        self.finished(kind, None, elapsed, False, failed)
+
+    def snapshot(self):
+        self.lock.acquire()
+        res={'kinds':dict([(k, e.snapshot()) for k, e in self.byKind.items()]),
+             'nodes':dict([(n, e.snapshot()) for n, e in self.byNode.items()])}
+        self.lock.release()
+        return res
+
+    # plain text table, one line per kind and per node
+    def report(self):
+        snapshot=self.snapshot()
+        lines=[]
+        header="%-22s %6s %6s %8s %8s %8s %8s %8s %8s" % ("", "count", "fly", "timeout", "failed", "mean", "p50", "p95", "max")
+        for title, section in (("command", snapshot['kinds']), ("node", snapshot['nodes'])):
+            lines.append(header.replace(" "*len(title), title, 1))
+            keys=section.keys()
+            keys.sort(lambda a, b: cmp(section[b]['total'], section[a]['total']))
+            for key in keys:
+                s=section[key]
+                lines.append("%-22s %6d %6d %8d %8d %8.3f %8s %8s %8.3f" %
+                             (key, s['count'], s['inflight'], s['timeouts'], s['failures'], s['mean'],
+                              formatBucket(s['p50']), formatBucket(s['p95']), s['max']))
+            lines.append("")
+        return "\n".join(lines)
+
+# percentile() as text
+def formatBucket(limit):
+    if limit==None:
+        return "-"
+    if isinstance(limit, str):
+        return limit
+    return "<%g" % limit
+
+class MetricsEntry:
+    def __init__(self):
+        self.counts=[0]*(len(LATENCY_BUCKETS)+1)
+        self.count=0
+        self.total=0.0
+        self.max=0.0
+        self.timeouts=0
+        self.failures=0
+        self.inflight=0
+
+    def add(self, elapsed, timedOut, failed=False):
+        i=0
+        while i<len(LATENCY_BUCKETS) and elapsed>LATENCY_BUCKETS[i]:
+            i=i+1
+        self.counts[i]=self.counts[i]+1
+        self.count=self.count+1
+        self.total=self.total+elapsed
+        self.max=max(self.max, elapsed)
+        if timedOut:
+            self.timeouts=self.timeouts+1
+        if failed:
+            self.failures=self.failures+1
+
+    # upper limit of the bucket holding the given fraction of the
+    # samples, the last bucket has none and gives the text ">60"
+    # (which, unlike an infinite float, goes into JSON)
+    def percentile(self, fraction):
+        if self.count==0:
+            return None
+        seen=0
+        for i in range(len(self.counts)):
+            seen=seen+self.counts[i]
+            if seen>=fraction*self.count:
+                break
+        if i<len(LATENCY_BUCKETS):
+            return LATENCY_BUCKETS[i]
+        return ">%g" % LATENCY_BUCKETS[-1]
+
+    def snapshot(self):
+        mean=0.0
+        if self.count>0:
+            mean=self.total/self.count
+        buckets=[]
+        for limit, n in zip(list(LATENCY_BUCKETS)+[None], self.counts):
+            buckets.append([limit, n])
+        return {'count':self.count, 'total':round(self.total, 4), 'mean':round(mean, 4),
+                'max':round(self.max, 4), 'timeouts':self.timeouts, 'failures':self.failures,
+                'inflight':self.inflight, 'p50':self.percentile(0.5), 'p95':self.percentile(0.95), 'buckets':buckets}
+
+## Deadline of each class of command (the kind given by commandInfo()),
+## adapted to the latencies seen so far the way TCP adapts its
+## retransmission timeout: TIMEOUT_MARGIN times the smoothed latency
+## plus four mean deviations. Until TIMEOUT_SAMPLES commands of a class
+## completed its deadline is TIMEOUT_INITIAL. Each timeout doubles the
+## deadline of its class, the next completed command resets it; no
+## deadline is ever longer than PROCESS_TIMEOUT.
+class Timeouts:
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.classes={}
+
+    def get(self, kind):
+        self.lock.acquire()
+        c=self.classes.get(kind)
+        if c==None or c.samples<TIMEOUT_SAMPLES:
+            deadline=TIMEOUT_INITIAL
+        else:
+            deadline=max(TIMEOUT_MIN, TIMEOUT_MARGIN*(c.mean+4*c.deviation))
+        if c!=None:
+            deadline=deadline*c.backoff
+        self.lock.release()
+        return min(deadline, PROCESS_TIMEOUT)
+
+    def add(self, kind, elapsed, timedOut):
+        self.lock.acquire()
+        c=self.classes.get(kind)
+        if c==None:
+            c=TimeoutClass()
+            self.classes[kind]=c
+        if timedOut:
+            c.backoff=min(c.backoff*2, PROCESS_TIMEOUT)
+        else:
+            c.add(elapsed)
+        self.lock.release()
+
+    def snapshot(self):
+        res={}
+        for kind in self.classes.keys():
+            res[kind]=round(self.get(kind), 3)
+        return res
+
+class TimeoutClass:
+    def __init__(self):
+        self.samples=0
+        self.mean=0.0
+        self.deviation=0.0
+        self.backoff=1
+
+    def add(self, elapsed):
+        if self.samples==0:
+            self.mean=elapsed
+            self.deviation=elapsed/2
+        else:
+            self.deviation=0.75*self.deviation+0.25*abs(elapsed-self.mean)
+            self.mean=0.875*self.mean+0.125*elapsed
+        self.samples=self.samples+1
+        self.backoff=1
+
+## Keeps the last size bytes written to it: the output of the commands
+## run for a module (see Engine.output()) is streamed into one while
+## they run. Older output is dropped as new output comes in.
+class RingBuffer:
+    def __init__(self, size):
+        self.size=size
+        self.chunks=collections.deque()
+        self.length=0
+        self.dropped=0
+        # bumped at each write, tells a viewer whether to redraw
+        self.version=0
+        self.lock=threading.Lock()
+
+    def write(self, data):
+        self.lock.acquire()
+        self.chunks.append(data)
+        self.length=self.length+len(data)
+        while self.length>self.size:
+            extra=self.length-self.size
+            first=self.chunks[0]
+            if len(first)<=extra:
+                self.chunks.popleft()
+                extra=len(first)
+            else:
+                self.chunks[0]=first[extra:]
+            self.length=self.length-extra
+            self.dropped=self.dropped+extra
+        self.version=self.version+1
+        self.lock.release()
+
+    def getvalue(self):
+        self.lock.acquire()
+        text="".join(self.chunks)
+        if self.dropped>0:
+            text="[... %d bytes dropped]\n" % self.dropped+text
+        self.lock.release()
+        return text
+
+## Circuit breaker of each node. A node is opened when a command on it
+## times out or its yarprun server cannot be reached; while open, the
+## commands for it fail at once as "node unreachable" instead of each
+## waiting for its deadline. BREAKER_RETRY seconds later the next
+## command probes the node first (half-open, one probe at a time, the
+## other commands keep failing fast): the node is closed again if the
+## probe succeeds, otherwise it stays open for another BREAKER_RETRY.
+## Any command that completes on a node closes it too.
+class NodeBreaker:
+    def __init__(self, probe):
+        self.probe=probe
+        self.lock=threading.Lock()
+        self.opened={}
+        self.probing=set()
+
+    # whether a command may be run on node, probing it if it is time
+    def allow(self, node):
+        self.lock.acquire()
+        opened=self.opened.get(node)
+        if opened==None:
+            self.lock.release()
+            return True
+        if node in self.probing or time.time()-opened<BREAKER_RETRY:
+            self.lock.release()
+            return False
+        self.probing.add(node)
+        self.lock.release()
+
+        print "-- Probing unreachable node", node
+        ok=False
+        try:
+            ok=self.probe(node)
+        finally:
+            self.lock.acquire()
+            self.probing.discard(node)
+            if ok:
+                self.opened.pop(node, None)
+            else:
+                self.opened[node]=time.time()
+            self.lock.release()
+        return ok
+
+    def failed(self, node):
+        self.lock.acquire()
+        if not node in self.opened:
+            print "--> Node", node, "is unreachable, failing its commands until it answers again"
+        self.opened[node]=time.time()
+        self.lock.release()
+
+    def succeeded(self, node):
+        self.lock.acquire()
+        self.opened.pop(node, None)
+        self.lock.release()
+
+    def isOpen(self, node):
+        return node in self.opened
+
+    def unreachable(self):
+        self.lock.acquire()
+        res=sorted(self.opened.keys())
+        self.lock.release()
+        return res
+
+## Limits on the commands sent to each node and on the processes forked
+## on this host, for all the applications together. For each node at
+## most maxInFlight commands run at a time and launches (yarprun --cmd)
+## draw from a token bucket refilled at launchRate per second, holding
+## up to launchBurst; on this host at most maxProcesses yarp/yarprun
+## processes run at a time. 0 means no limit. NODE_LIMITS and
+## MAX_PROCESSES are overridden by the configuration file (see
+## loadLimitsConfig()), then by the <limits> of the applications:
+##   <limits maxProcesses="32">
+##     <node launchRate="2" maxInFlight="8"/>
+##     <node name="pc104" launchRate="0.5" launchBurst="1"/>
+##   </limits>
+## (a <node> without name sets the limits of all the nodes).
+class Limiter:
+    def __init__(self):
+        self.cond=threading.Condition()
+        self.maxProcesses=MAX_PROCESSES
+        self.processes=0
+        self.defaults=dict(NODE_LIMITS)
+        self.settings={}
+        self.nodes={}
+
+    # limits is a dictionary node (None for all) -> {setting: value}
+    def configure(self, maxProcesses, limits):
+        self.cond.acquire()
+        if maxProcesses!=None:
+            self.maxProcesses=maxProcesses
+        for node, values in limits.items():
+            if node==None:
+                self.defaults.update(values)
+            else:
+                self.settings.setdefault(node, {}).update(values)
+        self.cond.notifyAll()
+        self.cond.release()
+
+    def setting(self, node, key):
+        return self.settings.get(node, {}).get(key, self.defaults[key])
+
+    # called with the lock held, seconds to wait before a command for
+    # node may run, 0 if it can run now
+    def delay(self, node, launch):
+        state=self.nodes.get(node)
+        if state==None:
+            state=NodeLimit(self.setting(node, 'launchBurst'))
+            self.nodes[node]=state
+
+        maxInFlight=self.setting(node, 'maxInFlight')
+        if maxInFlight>0 and state.inflight>=maxInFlight:
+            return LIMIT_POLL
+        rate=self.setting(node, 'launchRate')
+        if launch and rate>0:
+            now=time.time()
+            state.tokens=min(max(1, self.setting(node, 'launchBurst')), state.tokens+(now-state.stamp)*rate)
+            state.stamp=now
+            if state.tokens<1:
+                return (1-state.tokens)/rate
+        return 0
+
+    # wait for a slot for a command on node (a launch if launch is set),
+    # returns the seconds waited, None if cancelled meanwhile
+    def acquire(self, node, launch, cancel=None):
+        start=time.time()
+        self.cond.acquire()
+        try:
+            while True:
+                if cancel!=None and cancel.isSet():
+                    return None
+                wait=self.delay(node, launch)
+                if wait==0:
+                    break
+                self.cond.wait(min(wait, LIMIT_POLL))
+            state=self.nodes[node]
+            state.inflight=state.inflight+1
+            if launch and self.setting(node, 'launchRate')>0:
+                state.tokens=state.tokens-1
+        finally:
+            self.cond.release()
+        return time.time()-start
+
+    def release(self, node):
+        self.cond.acquire()
+        self.nodes[node].inflight=self.nodes[node].inflight-1
+        self.cond.notifyAll()
+        self.cond.release()
+
+    # same for a process forked on this host
+    def acquireProcess(self, cancel=None):
+        start=time.time()
+        self.cond.acquire()
+        try:
+            while self.maxProcesses>0 and self.processes>=self.maxProcesses:
+                if cancel!=None and cancel.isSet():
+                    return None
+                self.cond.wait(LIMIT_POLL)
+            self.processes=self.processes+1
+        finally:
+            self.cond.release()
+        return time.time()-start
+
+    def releaseProcess(self):
+        self.cond.acquire()
+        self.processes=self.processes-1
+        self.cond.notifyAll()
+        self.cond.release()
+
+class NodeLimit:
+    def __init__(self, burst):
+        self.inflight=0
+        self.tokens=max(1, burst)
+        self.stamp=time.time()
+
+LIMIT_TYPES={'launchRate':float, 'launchBurst':int, 'maxInFlight':int}
+
+# {setting: text} of a <node> or configuration file section to
+# {setting: value}, unknown or malformed settings are added to warnings
+def parseLimits(values, where, warnings):
+    res={}
+    for key, text in values.items():
+        if key=='name' or key=='maxProcesses':
+            continue
+        if not key in LIMIT_TYPES:
+            warnings.append("WARNING: unknown limit %s in %s" % (key, where))
+            continue
+        try:
+            res[key]=LIMIT_TYPES[key](text)
+        except ValueError:
+            warnings.append("WARNING: bad value %s for %s in %s" % (text, key, where))
+    return res
+
+def parseMaxProcesses(text, where, warnings):
+    if text==None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        warnings.append("WARNING: bad value %s for maxProcesses in %s" % (text, where))
+        return None
+
+## Limits from the configuration file ($MANAGER_CONFIG, ~/.manager.ini
+## by default), returns (maxProcesses or None, limits as taken by
+## Limiter.configure()). The [limits] section has maxProcesses and the
+## limits of all the nodes, a [node <name>] section those of a node:
+##   [limits]
+##   maxProcesses=32
+##   launchRate=2
+##   [node pc104]
+##   maxInFlight=2
+def loadLimitsConfig(path=None):
+    if path==None:
+        path=os.environ.get("MANAGER_CONFIG", os.path.join(os.path.expanduser("~"), ".manager.ini"))
+    parser=ConfigParser.RawConfigParser()
+    # settings are camelCase
+    parser.optionxform=str
+    try:
+        if not parser.read(path):
+            return None, {}
+    except ConfigParser.Error, e:
+        print "WARNING: could not read", path+":", str(e)
+        return None, {}
+
+    maxProcesses=None
+    limits={}
+    warnings=[]
+    for section in parser.sections():
+        values=dict(parser.items(section))
+        if section=="limits":
+            maxProcesses=parseMaxProcesses(values.get('maxProcesses'), path, warnings)
+            limits[None]=parseLimits(values, path, warnings)
+        elif section.startswith("node "):
+            limits[section[5:].strip()]=parseLimits(values, path, warnings)
+    for text in warnings:
+        print text
+    print "Limits read from", path
+    return maxProcesses, limits
+
+## State shared by all the applications of a descriptor file
+class Shared:
+    def __init__(self):
+        self.pool=WorkerPool(MAX_WORKERS)
+        self.cancelToken=CancelToken()
+        self.cache=StatusCache(STATUS_CACHE_TTL, self.cancelToken)
+        self.metrics=Metrics()
+
+        # port queries go straight to the name server when possible
+        self.names=None
+        if yarpclient!=None:
+            self.names=yarpclient.NameClient.fromConfig(record=self.metrics.add)
+
+        # and yarprun commands to the yarprun servers
+        self.runs=None
+        if self.names!=None and NATIVE_YARPRUN:
+            self.runs=yarpclient.RunClient(self.names)
+
+        self.timeouts=Timeouts()
+        self.breaker=NodeBreaker(self.probeNode)
+
+        self.limiter=Limiter()
+        maxProcesses, limits=loadLimitsConfig()
+        self.limiter.configure(maxProcesses, limits)
+
+    # cheap check that a node's yarprun server is there again: its port
+    # answers (the name server is asked directly when possible)
+    def probeNode(self, node):
+        if self.names!=None:
+            try:
+                return self.names.exists('/'+node)
+            except yarpclient.NameClientError:
+                pass
+        result=runProcess(['yarp', 'exists', '/'+node], BREAKER_PROBE_TIMEOUT, self.cancelToken)
+        return result.ret==0
+
+## Everything needed to check, start and stop an application without
+## a GUI: App drives it from the Tk window, runBatch() from the command
+## line. Methods take plain values (ModuleData, (from, to, protocol)
+## tuples, port names) and must not touch widgets; report(i, value),
+## when given, is called as soon as the result for item i is known.
+class Engine:
+    # engines of the applications managed together share the worker
+    # pool, the status cache and the cancel token, see Shared
+    def __init__(self, application, shared=None):
+        if shared==None:
+            shared=Shared()
+
+        self.application=application
+        self.pool=shared.pool
+        self.countLock=threading.Lock()
+        self.commands=0
+        self.cancelToken=shared.cancelToken
+        self.cache=shared.cache
+        self.metrics=shared.metrics
+        self.names=shared.names
+        self.runs=shared.runs
+        self.timeouts=shared.timeouts
+        self.breaker=shared.breaker
+        self.limiter=shared.limiter
+        self.limiter.configure(application.maxProcesses, application.limits)
+        # output of the commands run for each module (by tag), None
+        # for the commands of no module (connections, ...)
+        self.outputs={}
+        self.outputsLock=threading.Lock()
+
+        # open log file
+        log=self.application.getLogFilename()
+        self.log=OperationLog(log)
+        print "Logging to: "+log
+        self.log.write({'event':'start', 'application':self.application.getName(), 'time':time.time(),
+                        'pid':os.getpid(),
+                        'modules':[{'name':m.name, 'node':m.node, 'tag':m.tag} for m in self.application.modules],
+                        'connections':[{'from':c.output, 'to':c.input, 'protocol':c.protocol} for c in self.application.connections]})
+
+    def close(self):
+        self.log.write({'event':'stop', 'application':self.application.getName(), 'time':time.time(),
+                        'commands':self.commands})
+        self.log.close()
+
+    def spawnProcess(self, cmd, timeout=None):
+        return self.runCommand(cmd, timeout).ret
+
+    def output(self, tag):
+        self.outputsLock.acquire()
+        buf=self.outputs.get(tag)
+        if buf==None:
+            buf=RingBuffer(OUTPUT_BUFFER_SIZE)
+            self.outputs[tag]=buf
+        self.outputsLock.release()
+        return buf
+
+    # timeout defaults to the adapted deadline of the kind of command,
+    # commands for an unreachable node fail without being run; what
+    # the command prints goes to the output buffer of its module
+    def runCommand(self, cmd, timeout=None):
+        kind, node, tag=commandInfo(cmd)
+        output=self.output(tag)
+        output.write("%s $ %s\n" % (time.strftime("%H:%M:%S"), " ".join(cmd)))
+        start=time.time()
+        if node!=None and not self.breaker.allow(node):
+            output.write("[node unreachable]\n")
+            print "--> Node", node, "unreachable, not running", str(cmd)
+            self.metrics.add("node unreachable", 0, True)
+            self.log.write({'event':'command', 'time':start, 'elapsed':0, 'cmd':cmd, 'kind':kind,
+                            'node':node, 'tag':tag, 'unreachable':True})
+            return ProcessResult(cmd, 1, "", "node unreachable", 0, False, unreachable=True)
+
+        self.countLock.acquire()
+        print "Running: ", str(cmd)
+        self.commands=self.commands+1
+        self.countLock.release()
+
+        if timeout==None:
+            timeout=self.timeouts.get(kind)
+
+        # wait for the limits of the node, see Limiter
+        queued=0
+        if node!=None:
+            queued=self.limiter.acquire(node, kind=="yarprun --cmd", self.cancelToken)
+            if queued==None:
+                output.write("[cancelled]\n")
+                return ProcessResult(cmd, 1, "", "", 0, False, True)
+        self.metrics.started(kind, node)
+        began=time.time()
+        result=None
+        try:
+            if self.runs!=None and cmd[0]=='yarprun':
+                result=self.runNative(cmd, timeout)
+                if result!=None:
+                    output.write(result.out+result.err)
+            native=(result!=None)
+            if result==None:
+                result=self.forkProcess(cmd, timeout, output)
+        finally:
+            if node!=None:
+                self.limiter.release(node)
+            # a raising command still leaves the in flight count
+            if result==None:
+                self.metrics.finished(kind, node, time.time()-began, False, True)
+            else:
+                self.metrics.finished(kind, node, result.elapsed, result.timedOut)
+        if result.timedOut:
+            output.write("[timed out after %.1fs]\n" % timeout)
+        elif result.cancelled:
+            output.write("[cancelled]\n")
+        else:
+            output.write("[exit %d, %.2fs]\n" % (result.ret, result.elapsed))
+        if not result.cancelled and not result.unreachable:
+            self.timeouts.add(kind, result.elapsed, result.timedOut)
+
+        # a forked yarprun failing says nothing about the node, it may
+        # just be the module that is not running
+        if node!=None and not result.cancelled:
+            if result.timedOut or result.unreachable:
+                self.breaker.failed(node)
+            elif native or result.ret==0:
+                self.breaker.succeeded(node)
+
+        self.log.write({'event':'command', 'time':start, 'elapsed':round(result.elapsed, 4),
+                        'queued':round(queued, 4), 'cmd':cmd, 'kind':kind, 'node':node, 'tag':tag, 'ret':result.ret,
+                        'timeout':round(timeout, 3), 'timedOut':result.timedOut,
+                        'cancelled':result.cancelled, 'unreachable':result.unreachable, 'native':native})
+
+        if result.timedOut:
+            print "--> Error process timed out after %.1fs," % timeout,
+            print "you can try increasing the timeout time",
+            print "however this is probably due to a problem to your",
+            print "yarp network (address conflict?)"
+            print "See log file "+self.application.getLogFilename()
+            print "I'll now kill ", str(cmd), ""
+
+        return result
+
+    # within the cap on the processes forked on this host
+    def forkProcess(self, cmd, timeout, output):
+        if self.limiter.acquireProcess(self.cancelToken)==None:
+            return ProcessResult(cmd, 1, "", "", 0, False, True)
+        try:
+            return runProcess(cmd, timeout, self.cancelToken, output.write)
+        finally:
+            self.limiter.releaseProcess()
+
+    # yarprun command through the yarprun client, None if it has to be
+    # forked after all
+    def runNative(self, cmd, timeout):
+        start=time.time()
+        try:
+            ret, out, timedOut, cancelled=self.runs.call(cmd, timeout, self.cancelToken)
+        except yarpclient.RunNodeError, e:
+            print "--> yarprun client:", str(e)
+            return ProcessResult(cmd, 1, "", str(e), time.time()-start, False, unreachable=True)
+        except yarpclient.RunClientError, e:
+            print "--> yarprun client:", str(e)
+            return None
+        return ProcessResult(cmd, ret, out, "", time.time()-start, timedOut, cancelled)
+
+    def newProcessTable(self):
+        return ProcessTable(self.spawnProcess, self.runCommand)
+
+    # one name server snapshot per refresh, see PortRegistry; cached
+    # False neither reads nor fills the status cache (see
+    # Manager.watchWork), the same for checkModules() and checkPorts()
+    def newRegistry(self, cached=True):
+        cache=None
+        if cached:
+            cache=self.cache
+        return PortRegistry(self.spawnProcess, self.runCommand, cache, self.names)
+
+    # a module was started or stopped: its status, and the ports and
+    # connections it may have opened or closed, must be queried again
+    def moduleChanged(self, data):
+        self.cache.invalidate(('module', data.node, data.tag), ('port', 'conn'))
+
+    # run fn(item) for every item on the pool, returns the results in
+    # order together with the time each one took
+    def runAll(self, fn, items, report=None):
+        def timed(i, item):
+            start=time.time()
+            res=fn(item)
+            elapsed=time.time()-start
+            if report!=None:
+                report(i, res)
+            return res, elapsed
+
+        jobs=[]
+        for i in range(len(items)):
+            jobs.append(self.pool.submit(timed, (i, items[i])))
+
+        results=[]
+        for job in jobs:
+            res=job.wait()
+            if res==None:
+                res=(None, 0)
+            results.append(res)
+        return results
+
+    def isRunning(self, node, tag):
+        def fetch():
+            cmd=['yarprun', '--on','/'+node,'--isrunning', tag]
+            return self.spawnProcess(cmd)==0
+        return self.cache.get(('module', node, tag), fetch)
+
+    def checkModules(self, data, report=None, cached=True):
+        # only modules not in cache go through the process tables
+        running=[None]*len(data)
+        missing=[]
+        for i in range(len(data)):
+            if cached and self.cache.has(('module', data[i].node, data[i].tag)):
+                running[i]=self.isRunning(data[i].node, data[i].tag)
+            else:
+                missing.append(i)
+
+        if missing:
+            modules=[(data[i].node, data[i].tag) for i in missing]
+            generation=self.cache.generation
+            flags=self.newProcessTable().runningMany(modules, self.pool)
+            for i, flag in zip(missing, flags):
+                running[i]=flag
+                if cached and not self.cancelToken.isSet():
+                    self.cache.put(('module', data[i].node, data[i].tag), flag, generation)
+
+        # like the cache, the rows keep what they showed if cancelled
+        if report!=None and not self.cancelToken.isSet():
+            for i in range(len(running)):
+                report(i, running[i])
+        return running
+
+    def checkModule(self, data):
+        return self.isRunning(data.node, data.tag)
+
+    # start a module and tell whether it is running afterwards
+    def launchModule(self, data):
+        ret=self.spawnProcess(data.startCmd())
+        self.moduleChanged(data)
+
+        return self.isRunning(data.node, data.tag)
+
+    def runModule(self, data):
+        if self.isRunning(data.node, data.tag):
+            print "Module already running, skipping"
+            return True
+
+        return self.launchModule(data)
+
+    # returns a list of (running, seconds spent starting the module)
+    def runModules(self, data, conns, report=None):
+        print "-- Running modules"
+
+        # one concurrent status check, then start whatever is not
+        # running wave by wave in dependency order
+        running=self.checkModules(data, report)
+
+        skip=[]
+        for d, r in zip(data, running):
+            if r:
+                print d.tag, "already running, skipping"
+                skip.append(d.tag)
+
+        index={}
+        for i in range(len(data)):
+            index[data[i].tag]=i
+
+        def launch(d):
+            flag=self.launchModule(d)
+            running[index[d.tag]]=flag
+            if report!=None:
+                report(index[d.tag], flag)
+
+        scheduler=LaunchScheduler(self.pool, LAUNCH_CONCURRENCY)
+        durations=scheduler.run(data, [(c[0], c[1]) for c in conns], launch, skip)
+
+        return [(r, durations.get(d.tag, 0)) for d, r in zip(data, running)]
+
+    def quitModule(self, data):
+        cmd=['yarprun', '--on', '/'+data.node, '--sigterm', data.tag]
+        ret=self.spawnProcess(cmd)
+        self.moduleChanged(data)
+        return ret
+
+    def quitModules(self, data):
+        print "-- Quitting modules"
+        return self.runAll(self.quitModule, data)
+
+    def killModule(self, data):
+        cmd=['yarprun', '--on', '/'+data.node, '--kill', data.tag, '9']
+        ret=self.spawnProcess(cmd)
+        self.moduleChanged(data)
+        return ret
+
+    def killModules(self, data):
+        print "-- Stopping modules"
+        return self.runAll(self.killModule, data)
+
+    # graceful shutdown: SIGTERM to the running modules, consumers
+    # before their producers (the launch waves in reverse order, the
+    # modules of a wave all at once), waiting for each wave to exit
+    # until SHUTDOWN_TIMEOUT (shared by all the waves) is over; every
+    # wave gets SIGTERM and at least SHUTDOWN_MIN_GRACE, even if an
+    # earlier one used up the timeout. Only the modules that still run
+    # after their SIGTERM get killed. Returns a list of (how, seconds until
+    # the module was gone), how is "not running", "stopped", "killed",
+    # "failed" (still running after the kill) or "cancelled" (left
+    # alone once cancel was set, its status is not known).
+    def shutdownModules(self, data, conns, report=None):
+        print "-- Shutting down modules"
+        start=time.time()
+        for d in data:
+            self.moduleChanged(d)
+        running=self.checkModules(data)
+        if self.cancelToken.isSet():
+            return [("cancelled", 0)]*len(data)
+        deadline=time.time()+SHUTDOWN_TIMEOUT
+
+        results=[("not running", 0)]*len(data)
+        index={}
+        for i in range(len(data)):
+            index[data[i].tag]=i
+        left=[]
+
+        def gone(d, how):
+            i=index[d.tag]
+            results[i]=(how, time.time()-start)
+            if report!=None:
+                report(i, False)
+
+        # a cancelled command reads as "not running", the status of what
+        # was left is unknown and nothing more is done to it
+        def cancelled(wave):
+            for d in wave:
+                results[index[d.tag]]=("cancelled", time.time()-start)
+
+        scheduler=LaunchScheduler(self.pool, 0)
+        deps=scheduler.dependencies(data, [(c[0], c[1]) for c in conns])
+        waves=scheduler.waves(data, deps, ())
+        waves.reverse()
+        for wave in waves:
+            wave=[data[index[tag]] for tag in wave if running[index[tag]]]
+            if self.cancelToken.isSet():
+                cancelled(wave)
+                continue
+
+            self.runAll(self.quitModule, wave)
+            waveDeadline=max(deadline, time.time()+SHUTDOWN_MIN_GRACE)
+            while wave and time.time()<waveDeadline and not self.cancelToken.isSet():
+                time.sleep(min(SHUTDOWN_POLL, max(0, waveDeadline-time.time())))
+                for d in wave:
+                    self.moduleChanged(d)
+                flags=self.newProcessTable().runningMany([(d.node, d.tag) for d in wave], self.pool)
+                if self.cancelToken.isSet():
+                    break
+                for d, flag in zip(wave, flags):
+                    if not flag:
+                        gone(d, "stopped")
+                wave=[d for d, flag in zip(wave, flags) if flag]
+            if self.cancelToken.isSet():
+                cancelled(wave)
+            else:
+                left.extend(wave)
+
+        if left and self.cancelToken.isSet():
+            cancelled(left)
+        elif left:
+            print "--", len(left), "modules still running, killing", " ".join([d.tag for d in left])
+            self.runAll(self.killModule, left)
+            flags=self.newProcessTable().runningMany([(d.node, d.tag) for d in left], self.pool)
+            if self.cancelToken.isSet():
+                cancelled(left)
+                flags=[]
+            for d, flag in zip(left, flags):
+                if flag:
+                    results[index[d.tag]]=("failed", time.time()-start)
+                else:
+                    gone(d, "killed")
+
+        print "-- Shut down in %.2fs" % (time.time()-start)
+        return results
+
+    def checkPorts(self, conns, registry=None, cached=True):
+        if registry==None:
+            registry=self.newRegistry(cached)
+
+        cache=None
+        if cached:
+            cache=self.cache
+        pairs=[(c[0], c[1]) for c in conns]
+        checker=ConnectionChecker(self.pool, self.spawnProcess, registry, cache)
+        return checker.check(pairs)
+
+    def newConnector(self, registry=None):
+        if registry==None:
+            registry=self.newRegistry()
+        checker=ConnectionChecker(self.pool, self.spawnProcess, registry, self.cache)
+        return BulkConnector(self.pool, self.runCommand, checker, self.cache, CONNECT_CONCURRENCY)
+
+    def connectPorts(self, conns):
+        print "-- Connecting ports"
+        return self.newConnector().apply(conns, True)
+
+    def disconnectPorts(self, conns):
+        print "-- Disconnecting ports"
+        return self.newConnector().apply(conns, False)
+
+    def checkDeps(self, names, registry=None):
+        print "-- Checking port dependencies:"
+
+        if registry==None:
+            registry=self.newRegistry()
+
+        return registry.existsMany(names, self.pool)
+
+## Supervisor of the modules of an application: while started, it
+## checks every SUPERVISE_INTERVAL whether the modules it saw running
+## still are (see Engine.checkModules) and relaunches those that died.
+## The first restart happens RESTART_BACKOFF after the module was
+## found dead, each restart in a row doubles the wait, up to
+## RESTART_MAX_BACKOFF; a module that stays up for CRASH_LOOP_WINDOW is
+## forgiven. A module restarted CRASH_LOOP_RESTARTS times within
+## CRASH_LOOP_WINDOW is in a crash loop and is left alone. The modules
+## of a node that does not answer (see NodeBreaker) have no known status
+## and are left as they are until it does. Once a
+## restarted module's ports are back its connections are restored
+## (see BulkConnector). Modules stopped on purpose must be reported with
+## stopped(), otherwise they would be started again; they are
+## supervised again once seen running after having been seen stopped,
+## or if they still run SUPERVISE_HOLD after stopped() (the stop failed
+## or was cancelled).
+class Supervisor:
+    def __init__(self, engine, data, conns, report=None):
+        self.engine=engine
+        self.data=data
+        self.conns=conns
+        self.report=report
+        self.stopEvent=threading.Event()
+        self.thread=None
+        self.lock=threading.Lock()
+
+        self.last=[None]*len(data)
+        self.states={}
+        for d in data:
+            self.states[d.tag]=SupervisedModule()
+
+        # connections to restore when a module comes back: those to or
+        # from its ports (same matching as LaunchScheduler), with the
+        # modules at their ends
+        scheduler=LaunchScheduler(engine.pool, 0)
+        owners=[]
+        for d in data:
+            for prefix in scheduler.prefixes(d):
+                owners.append((prefix, d.tag))
+        self.ends={}
+        for output, input, protocol in conns:
+            tags=set([scheduler.owner(output, owners), scheduler.owner(input, owners)])
+            tags.discard(None)
+            self.ends[(output, input)]=tags
+            for tag in tags:
+                self.states[tag].conns.append((output, input, protocol))
+
+    def start(self):
+        print "-- Supervising", self.engine.application.getName()
+        self.stopEvent.clear()
+        self.thread=threading.Thread(target=self.run)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    # wait for the current check/restart to finish if asked to
+    def stop(self, wait=False):
+        self.stopEvent.set()
+        if wait and self.thread!=None:
+            self.thread.join()
+        self.thread=None
+        print "-- Stopped supervising", self.engine.application.getName()
+
+    # the module was stopped on purpose, do not restart it
+    def stopped(self, tag):
+        self.lock.acquire()
+        state=self.states.get(tag)
+        if state!=None:
+            state.seen=False
+            state.held=True
+            state.heldSince=time.time()
+            state.deadSince=None
+        self.lock.release()
+
+    def run(self):
+        while not self.stopEvent.isSet():
+            wait=SUPERVISE_INTERVAL
+            try:
+                wait=self.step()
+            except Exception, e:
+                print "--> Error in supervisor:", str(e)
+            self.stopEvent.wait(wait)
+
+    # one check (and the restarts that are due), returns how long to
+    # wait before the next: sooner than SUPERVISE_INTERVAL if a restart
+    # is due before
+    def step(self):
+        # around the status cache, which user actions rely on meanwhile
+        running=self.engine.checkModules(self.data, None, False)
+        if self.stopEvent.isSet() or self.engine.cancelToken.isSet():
+            return SUPERVISE_INTERVAL
+        for i in range(len(running)):
+            if self.engine.breaker.isOpen(self.data[i].node):
+                running[i]=self.last[i]
+        if self.report!=None:
+            for i in range(len(running)):
+                if running[i]!=self.last[i]:
+                    self.report(i, running[i])
+        self.last=running
+
+        now=time.time()
+        restart=[]
+        self.lock.acquire()
+        for d, flag in zip(self.data, running):
+            state=self.states[d.tag]
+            if self.engine.breaker.isOpen(d.node):
+                # the node does not answer, the status is not known
+                continue
+            if not flag:
+                # the module stopped on purpose is gone now
+                state.held=False
+            elif state.held and now-state.heldSince>SUPERVISE_HOLD:
+                print "--> Module", d.tag, "is still running after being stopped, supervising it again"
+                state.held=False
+            if flag and not state.held:
+                if not state.seen or state.deadSince!=None:
+                    state.upSince=now
+                state.seen=True
+                state.deadSince=None
+                if state.upSince!=None and now-state.upSince>CRASH_LOOP_WINDOW:
+                    state.backoff=RESTART_BACKOFF
+            elif state.seen and not state.crashLoop:
+                if state.deadSince==None:
+                    print "--> Module", d.tag, "is not running anymore, restarting it in %.1fs" % state.backoff
+                    state.deadSince=now
+                    self.engine.log.write({'event':'died', 'time':now, 'tag':d.tag, 'node':d.node})
+                if now-state.deadSince>=state.backoff:
+                    restart.append(d)
+        self.lock.release()
+
+        for d in restart:
+            self.restart(d)
+        self.reconnect()
+
+        wait=SUPERVISE_INTERVAL
+        now=time.time()
+        for d in self.data:
+            state=self.states[d.tag]
+            if self.engine.breaker.isOpen(d.node):
+                continue
+            if state.deadSince!=None and state.seen and not state.crashLoop:
+                wait=min(wait, max(0, state.deadSince+state.backoff-now))
+        return wait
+
+    def restart(self, d):
+        state=self.states[d.tag]
+        now=time.time()
+        restarts=[t for t in state.restarts if now-t<CRASH_LOOP_WINDOW]+[now]
+        if len(restarts)>CRASH_LOOP_RESTARTS:
+            print "--> Module", d.tag, "restarted", CRASH_LOOP_RESTARTS, "times in %ds, crash loop: giving up" % CRASH_LOOP_WINDOW
+            state.restarts=restarts
+            state.crashLoop=True
+            self.engine.log.write({'event':'crash loop', 'time':now, 'tag':d.tag, 'node':d.node})
+            return
+
+        print "-- Restarting", d.tag, "(restart %d)" % len(restarts)
+        flag=self.engine.launchModule(d)
+        if not flag and self.engine.breaker.isOpen(d.node):
+            # failed fast, the node went away: not a restart of the
+            # module, it is tried again once the node answers
+            print "--> Node", d.node, "unreachable, restart of", d.tag, "postponed"
+            return
+        state.restarts=restarts
+        self.engine.log.write({'event':'restart', 'time':now, 'tag':d.tag, 'node':d.node,
+                               'running':flag, 'backoff':state.backoff})
+        state.total=state.total+1
+        state.deadSince=time.time()
+        state.backoff=min(state.backoff*2, RESTART_MAX_BACKOFF)
+        if flag:
+            state.deadSince=None
+            state.upSince=time.time()
+            state.reconnect=True
+        i=self.data.index(d)
+        self.last[i]=flag
+        if self.report!=None:
+            self.report(i, flag)
+
+    # whether the module at the end of a connection is up, as far as
+    # the supervisor knows
+    def up(self, tag):
+        state=self.states[tag]
+        return state.seen and state.deadSince==None and not state.crashLoop and not state.held
+
+    # connect again what was connected to restarted modules, as soon as
+    # their ports are there; connections to modules that are down wait
+    # for them, what is not restored within CRASH_LOOP_WINDOW is given up
+    def reconnect(self):
+        now=time.time()
+        for d in self.data:
+            state=self.states[d.tag]
+            if not state.reconnect or self.stopEvent.isSet():
+                continue
+            if not state.conns or now-state.upSince>CRASH_LOOP_WINDOW:
+                if state.conns:
+                    print "--> Connections of", d.tag, "not restored in %ds, giving up" % CRASH_LOOP_WINDOW
+                state.reconnect=False
+                continue
+            conns=[c for c in state.conns if not False in [self.up(tag) for tag in self.ends[(c[0], c[1])]]]
+            if not conns:
+                continue
+            results, status=self.engine.connectPorts(conns)
+            ports, connected=status
+            if len(conns)==len(state.conns) and not False in connected.values():
+                print "-- Connections of", d.tag, "restored"
+                state.reconnect=False
+
+    # restarts per module tag, and which modules gave up
+    def summary(self):
+        res={}
+        for d in self.data:
+            state=self.states[d.tag]
+            res[d.tag]={'restarts':state.total, 'crashLoop':state.crashLoop}
+        return res
+
+class SupervisedModule:
+    def __init__(self):
+        self.seen=False
+        self.held=False
+        self.heldSince=None
+        self.deadSince=None
+        self.upSince=None
+        self.backoff=RESTART_BACKOFF
+        self.restarts=[]
+        self.total=0
+        self.crashLoop=False
+        self.reconnect=False
+        self.conns=[]
+
 class Window:
     def __init__(self, master, moduleData):
         frame=Toplevel()
@@ -270,26 +2744,306 @@ class Window:
         rootx=master.winfo_rootx()
         rooty=master.winfo_rooty()
         frame.geometry('%dx%d+%d+%d' %(width, height, rootx, rooty))
-        frame.title(moduleData.entryName.get())
+        frame.title(moduleData.name)
+
+## Scrolled table that only has widgets for the TABLE_ROWS rows in view:
+## they are created once (a slot per line) and bound to whichever rows
+## are scrolled in, so the cost of the window does not grow with the
+## size of the application. It shows the records of a Model (ModuleRow,
+## ConnectionRow, with status() and color(column) methods); columns are
+## (title, attribute, kind, width) tuples, kind is "entry" (editable,
+## written back to the row before it is scrolled out, see store()),
+## "check" (editable flag) or "flag" (read only flag); buttons are
+## (text, command) pairs, command is called with the row of the line.
+## Clicking on a title sorts by that column, rows are filtered by status
+## and by words: "node:pc104" matches the node column, a plain word
+## (or one whose prefix is not a column, like the port "/cam/left:o")
+## any column. Changes to the model are drawn by sync().
+class Table:
+    def __init__(self, master, columns, model, statuses, buttons=[]):
+        self.master=master
+        self.columns=columns
+        self.model=model
+        self.rows=model.records
+        self.buttons=buttons
+        self.view=range(len(self.rows))
+        self.first=0
+        # False: in descriptor order, None: by status
+        self.sortKey=False
+        self.sortReverse=False
+        # version of the model on screen
+        self.drawn=model.version
+
+        tools=Frame(master)
+        tools.pack(fill=X)
+        Label(tools, text="Filter:").pack(side=LEFT)
+        self.filterText=StringVar()
+        self.filterText.trace("w", lambda *args: self.reset())
+        Entry(tools, textvariable=self.filterText, width=24).pack(side=LEFT)
+        self.statusFilter=StringVar()
+        self.statusFilter.set("all")
+        OptionMenu(tools, self.statusFilter, *(["all"]+statuses), command=lambda value: self.reset()).pack(side=LEFT)
+        self.countText=StringVar()
+        Label(tools, textvariable=self.countText).pack(side=LEFT)
+
+        self.body=Frame(master)
+        self.body.pack()
+        c=0
+        for title, key, kind, width in columns:
+            Button(self.body, text=title, relief=FLAT, command=lambda key=key: self.sort(key)).grid(row=0, column=c, sticky=W)
+            c=c+1
+        Button(self.body, text="Status:", relief=FLAT, command=lambda: self.sort(None)).grid(row=0, column=c, columnspan=max(1, len(buttons)), sticky=W)
+
+        self.slots=[]
+        for r in range(min(TABLE_ROWS, len(self.rows))):
+            self.slots.append(self.newSlot(r+1))
+
+        self.scrollbar=AutoScrollbar(self.body, command=self.yview)
+        self.scrollbar.grid(row=1, column=len(columns)+len(buttons), rowspan=max(1, len(self.slots)), sticky=N+S)
+        self.draw()
+
+    def newSlot(self, r):
+        slot=TableSlot()
+        for title, key, kind, width in self.columns:
+            if kind=="entry":
+                w=Entry(self.body, width=width)
+            else:
+                var=IntVar()
+                w=Checkbutton(self.body, variable=var)
+                w.var=var
+                if kind=="flag":
+                    w.config(state=DISABLED,disabledforeground="#00A000")
+            slot.widgets.append(w)
+        for text, command in self.buttons:
+            slot.widgets.append(Button(self.body, text=text, command=lambda slot=slot, command=command: self.press(slot, command)))
+
+        for c in range(len(slot.widgets)):
+            slot.widgets[c].grid(row=r, column=c, sticky=W)
+            slot.widgets[c].bind("<MouseWheel>", self.wheel)
+            slot.widgets[c].bind("<Button-4>", self.wheel)
+            slot.widgets[c].bind("<Button-5>", self.wheel)
+        return slot
+
+    def press(self, slot, command):
+        self.store()
+        if slot.row!=None:
+            command(slot.row)
+
+    # copy what was typed in the lines in view to their rows
+    def store(self):
+        for slot in self.slots:
+            if slot.row==None:
+                continue
+            for (title, key, kind, width), w in zip(self.columns, slot.widgets):
+                if kind=="entry":
+                    self.model.update(slot.row, **{key:w.get()})
+                elif kind=="check":
+                    self.model.update(slot.row, **{key:w.var.get()})
+
+    def bind(self, slot, row):
+        if row==None:
+            if slot.row!=None:
+                for w in slot.widgets:
+                    w.grid_remove()
+            slot.row=None
+            return
+
+        if slot.row==None:
+            for w in slot.widgets:
+                w.grid()
+        elif slot.row is row and slot.version==row.version:
+            return
+        slot.row=row
+        slot.version=row.version
+        for (title, key, kind, width), w in zip(self.columns, slot.widgets):
+            value=getattr(row, key)
+            if kind=="entry":
+                # leave the line alone if it shows the value already,
+                # the user may be typing in it
+                if w.get()!=value:
+                    w.delete(0, END)
+                    w.insert(END, value)
+                color=row.color(key)
+                if color!=None:
+                    w.config(foreground=color)
+            else:
+                # unknown status (None) shows unchecked, see color()
+                w.var.set(int(bool(value)))
+
+    def draw(self):
+        for i in range(len(self.slots)):
+            row=None
+            if self.first+i<len(self.view):
+                row=self.rows[self.view[self.first+i]]
+            self.bind(self.slots[i], row)
+
+        total=len(self.view)
+        if total==0:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(float(self.first)/total, float(min(self.first+len(self.slots), total))/total)
+        self.countText.set("%d of %d" % (total, len(self.rows)))
+
+    def value(self, row, key):
+        if key==None:
+            return row.status()
+        return getattr(row, key)
+
+    def matches(self, row, words):
+        columns=[c[1] for c in self.columns]
+        for word in words:
+            key, sep, text=word.partition(':')
+            if sep!="" and key in columns:
+                keys=[key]
+            else:
+                keys=columns
+                text=word
+            found=False
+            for k in keys:
+                if text.lower() in str(getattr(row, k)).lower():
+                    found=True
+            if not found:
+                return False
+        return True
+
+    def refilter(self):
+        self.store()
+        self.drawn=self.model.version
+        words=self.filterText.get().split()
+        status=self.statusFilter.get()
+        view=[]
+        for i in range(len(self.rows)):
+            row=self.rows[i]
+            if status!="all" and row.status()!=status:
+                continue
+            if self.matches(row, words):
+                view.append(i)
+        if self.sortKey!=False:
+            view.sort(key=lambda i: self.value(self.rows[i], self.sortKey), reverse=self.sortReverse)
+
+        self.view=view
+        self.first=max(0, min(self.first, len(view)-len(self.slots)))
+        self.draw()
+
+    # a second click on the same column reverses the order, key None
+    # sorts by status
+    def sort(self, key):
+        if key==self.sortKey:
+            self.sortReverse=not self.sortReverse
+        else:
+            self.sortKey=key
+            self.sortReverse=False
+        self.reset()
+
+    # new filter or order, back to the top
+    def reset(self):
+        self.first=0
+        self.refilter()
+
+    def scrollTo(self, first):
+        first=max(0, min(first, len(self.view)-len(self.slots)))
+        if first!=self.first:
+            self.store()
+            self.first=first
+            self.draw()
+
+    # scrollbar command: ("moveto", fraction) or ("scroll", n, "units"/"pages")
+    def yview(self, *args):
+        if args[0]=="moveto":
+            self.scrollTo(int(float(args[1])*len(self.view)))
+        elif args[0]=="scroll":
+            amount=int(args[1])
+            if args[2]=="pages":
+                amount=amount*len(self.slots)
+            self.scrollTo(self.first+amount)
+
+    def wheel(self, event):
+        if event.num==5 or event.delta<0:
+            self.scrollTo(self.first+3)
+        else:
+            self.scrollTo(self.first-3)
+
+    # redraw if records changed since the last time (filtering and
+    # sorting again, the status may have changed); only the lines whose
+    # record changed are touched, see bind()
+    def sync(self):
+        if self.model.version!=self.drawn:
+            self.refilter()
+
+class TableSlot:
+    def __init__(self):
+        self.row=None
+        self.version=None
+        self.widgets=[]
+
+## Output of the commands run for a module (see RingBuffer), refreshed
+## while the window is open
+class OutputWindow:
+    def __init__(self, master, title, output):
+        frame=Toplevel()
+        self.master=frame
+        self.output=output
+        self.version=None
+
+        self.text=Text(frame, width=100, height=30, font=("Courier", 9))
+        self.text.pack(fill=BOTH, expand=1)
+        frame.title(title)
+        self.refresh()
+
+    def refresh(self):
+        try:
+            if self.output.version!=self.version:
+                self.version=self.output.version
+                self.text.delete(1.0, END)
+                self.text.insert(END, self.output.getvalue())
+                self.text.see(END)
+        except TclError:
+            # window closed
+            return
+        self.master.after(STATS_UPDATE_INTERVAL, self.refresh)
+
+## Latency statistics (see Metrics), refreshed while the window is open
+class StatsWindow:
+    def __init__(self, master, metrics):
+        frame=Toplevel()
+        self.master=frame
+        self.metrics=metrics
+
+        self.text=Text(frame, width=80, height=30, font=("Courier", 9))
+        self.text.pack(fill=BOTH, expand=1)
+        frame.title("Command latency")
+        self.refresh()
+
+    def refresh(self):
+        try:
+            self.text.delete(1.0, END)
+            self.text.insert(END, self.metrics.report())
+        except TclError:
+            # window closed
+            return
+        self.master.after(STATS_UPDATE_INTERVAL, self.refresh)
 
+## Panel of one application, see Manager
 class App:
     application=AppData()
     dependenciesFlag=False
 
-    def __init__(self, master, app):
-        self.master=frame
-        self.titleFrame=Frame(frame)
+    def __init__(self, master, app, manager):
+        self.master=master
+        self.titleFrame=Frame(master)
         self.titleFrame.pack()
-        self.depFrame=Frame(frame)
+        self.depFrame=Frame(master)
         self.depFrame.pack()
-        self.modFrame=Frame(frame)
+        self.modFrame=Frame(master)
         self.modFrame.pack()
-        self.connFrame=Frame(frame)
+        self.connFrame=Frame(master)
         self.connFrame.pack()
-        self.actionsFrame=Frame(frame)
+        self.actionsFrame=Frame(master)
         self.actionsFrame.pack()
 
         self.application=app
+        self.manager=manager
+        self.engine=Engine(app, manager.shared)
 
         self.connections=[]
         self.portDep=[]
@@ -305,7 +3059,7 @@ class App:
             r=r+1
 
         for port in self.application.dependencies.ports:
-            tmp=EntryDependency(tmpFrame, port)
+            tmp=EntryDependency(tmpFrame, DependencyRow(port, "port"))
             tmp.check.grid(row=r, column=1, sticky=W)
             tmp.entry.grid(row=r, column=0, sticky=W)
             self.portDep.append(tmp)
@@ -315,7 +3069,7 @@ class App:
 
         r=r+1
         for node in self.application.dependencies.nodes:
-            tmp=EntryDependency(tmpFrame, node)
+            tmp=EntryDependency(tmpFrame, DependencyRow(node, "node"))
             tmp.check.grid(row=r, column=1, sticky=W)
             tmp.entry.grid(row=r, column=0, sticky=W)
             self.nodeDep.append(tmp)
@@ -324,73 +3078,34 @@ class App:
         tmp=Button(tmpFrame, text="Checkdep", command=self.checkDeps);
         tmp.grid(row=(r)/2, column=2, rowspan=r-1, sticky=S+N+E+W)
         r=r+1
+        self.depModel=Model([dep.row for dep in self.portDep+self.nodeDep])
 
-        tmpFrame=self.modFrame
-        Label(tmpFrame, text="Module:").grid(row=r, column=0, sticky=W)
-        Label(tmpFrame, text="On node:").grid(row=r, column=1, sticky=W)
-        Label(tmpFrame, text="Stdio:").grid(row=r, column=2, sticky=W)
-        Label(tmpFrame, text="Tag:").grid(row=r, column=3, sticky=W)
-        Label(tmpFrame, text="Hold:").grid(row=r, column=4, sticky=W)
-        
-        r=r+1
-
+        # only the lines in view have widgets, see Table
         for mod in self.application.modules:
-            if (mod.stdioNode!=""):
-                tmpModule=EntryModule(tmpFrame, mod.name, mod.parameters, mod.node, mod.tag, mod.workdir, mod.stdioNode)
-            else:
-                tmpModule=EntryModule(tmpFrame, mod.name, mod.parameters, mod.node, mod.tag, mod.workdir, "none")
-
-            self.modules.append(tmpModule)
-
-            tmpModule.entryName.grid(row=r, column=0, sticky=W)
-            tmpModule.entryName.config(width=12)
-
-            tmpModule.entryNode.grid(row=r, column=1, sticky=W)
-            tmpModule.entryNode.config(width=12)
-
-            tmpModule.entryIoNode.grid(row=r, column=2, sticky=W)
-            tmpModule.entryIoNode.config(width=12)
-
-            tmpModule.entryTag.grid(row=r, column=3, sticky=W)
-            tmpModule.entryTag.config(width=12)
-            
-            tmpModule.checkHold.grid(row=r, column=4, sticky=W)
-
-            tmp=Button(tmpFrame, text="Run", command=lambda i=tmpModule:self.runModule(i));
-            tmp.grid(row=r, column=5, sticky=W)
-            tmp=Button(tmpFrame, text="Ctrl-c", command=lambda i=tmpModule:self.quitModule(i));
-            tmp.grid(row=r, column=6, sticky=W)
-            tmp=Button(tmpFrame, text="Kill", command=lambda i=tmpModule:self.killModule(i));
-            tmp.grid(row=r, column=7, sticky=W)
-            tmp=Button(tmpFrame, text="Check", command=lambda i=tmpModule:self.checkModule(i));
-            tmp.grid(row=r, column=8, sticky=W)
-            tmp=Button(tmpFrame, text="Params", command=lambda i=tmpModule:self.dispParameters(i));
-            tmp.grid(row=r, column=9, sticky=W)
-            
-            r=r+1
-
-        tmpFrame=self.connFrame
-        Label(tmpFrame, text="Connections:").grid(row=r, column=0, sticky=W)
-        r=r+1
-
+            self.modules.append(ModuleRow(mod))
+        self.modModel=Model(self.modules)
+        self.modTable=Table(self.modFrame, [("Module:", "name", "entry", 12), ("On node:", "node", "entry", 12),
+                                            ("Stdio:", "stdioNode", "entry", 12), ("Tag:", "tag", "entry", 12),
+                                            ("Hold:", "hold", "check", 0)],
+                            self.modModel, ["running", "stopped", "unknown"],
+                            [("Run", self.runModule), ("Ctrl-c", self.quitModule), ("Kill", self.killModule),
+                             ("Check", self.checkModule), ("Params", self.dispParameters), ("Output", self.showOutput)])
+
+        Label(self.connFrame, text="Connections:").pack(anchor=W)
         for conn in self.application.connections:
-            tmp=EntryConnection(tmpFrame, conn.output, conn.input, conn.protocol)
-            tmp.outEntry.grid(row=r, column=0, sticky=W)
-            Label(tmpFrame, text="to:").grid(row=r, column=1)
-#           tmp.outCheck.grid(row=r, column=1, sticky=W)
-            tmp.inEntry.grid(row=r, column=2, sticky=W)
-#           tmp.inCheck.grid(row=r, column=3, sticky=W)
-            Label(tmpFrame, text="prot:").grid(row=r, column=3)
-            tmp.protEntry.grid(row=r, column=4, sticky=W)
-            tmp.connCheck.grid(row=r, column=5, sticky=W)
-            self.connections.append(tmp)
-            r=r+1
+            self.connections.append(ConnectionRow(conn.output, conn.input, conn.protocol))
+        self.connModel=Model(self.connections)
+        self.connTable=Table(self.connFrame, [("From:", "output", "entry", 20), ("To:", "input", "entry", 20),
+                                              ("Protocol:", "protocol", "entry", 8), ("", "connFlag", "flag", 0)],
+                             self.connModel, ["connected", "disconnected", "missing ports", "unknown"])
 
         tmpFrame=self.actionsFrame
         tmp=Button(tmpFrame, text="Run Modules", command=self.runModules)
         tmp.grid(row=r, column=0)
         tmp=Button(tmpFrame, text="Stop Modules", command=self.quitModules)
         tmp.grid(row=r, column=1)
+        tmp=Button(tmpFrame, text="Shutdown", command=self.shutdownModules)
+        tmp.grid(row=r, column=2)
         tmp=Button(tmpFrame, text="Kill Modules", command=self.killModules)
         tmp.grid(row=r, column=3)
         tmp=Button(tmpFrame, text="Update", command=self.update)
@@ -399,127 +3114,131 @@ class App:
         tmp.grid(row=r, column=5)
         tmp=Button(tmpFrame, text="Disconnect", command=self.disconnectPorts)
         tmp.grid(row=r, column=6)
+        self.supervising=IntVar()
+        self.supervisor=None
+        tmp=Checkbutton(tmpFrame, text="Supervise", variable=self.supervising, command=self.supervise)
+        tmp.grid(row=r, column=7)
+        tmp=Button(tmpFrame, text="Output", command=lambda: self.showOutput(None))
+        tmp.grid(row=r, column=8)
         r=r+1
 
-        # open log file
-        log=self.application.getLogFilename()
-        self.logfile=open(log,"w")
-        print "Logging to: "+log
-        self.logfile.writelines("== "+self.application.getName()+" ==\n")
-        self.logfile.writelines("Log started on ")
-        self.logfile.writelines(datetime.datetime.now().strftime("%A (%a) %d/%m/%Y\n"))
+    # actions are run by the manager, see Manager.submitAction
+    def submitAction(self, name, fn, args=()):
+        if len(self.manager.apps)>1:
+            name=self.application.getName()+": "+name
+        self.manager.submitAction(name, fn, args)
 
-        self.application.display(self.logfile)
+    def post(self, fn, *args):
+        self.manager.post(fn, *args)
 
-        #finally check dependencies and ports
-        self.checkDeps()
-        self.checkPorts()
+    # the model can be changed from any thread, the widgets follow in
+    # sync(); True if the record changed
+    def setRunning(self, mod, flag):
+        return self.modModel.update(mod, runningFlag=flag)
 
-    def spawnProcess(self, cmd):
-        print "Running: ", str(cmd)
-        self.logfile.writelines("Running"+str(cmd)+"\n")
-        fin_time = time.time() + PROCESS_TIMEOUT
-        p=subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-	#, stdout=self.logfile, stderr=self.logfile)
-        while (p.poll()==None and  fin_time > time.time()):
-            #self.logfile.writelines(p.communicate())
-	    #self.logfile.writelines(p.stdout.read())
-            time.sleep(PROCESS_POLL_INTERVAL)
-               
-        if (fin_time < time.time()):
-            self.logfile.writelines("Process timed out killing "+str(cmd)+"\n")
-            print "--> Error process timed out",
-            print "you can try increasing the timeout time",
-            print "however this is probably due to a problem to your",
-            print "yarp network (address conflict?)"
-            print "See log file /tmp/"+self.application.getName()+".log"
-            print "I'll now kill ", str(cmd), ""
-            #os.kill(p.pid, signal.SIGKILL)
-            portableKill(p)
-            
-            ret = 1
-        else:
-            ret = p.returncode
-            
-        return ret
+    def setConnection(self, port, outFlag, inFlag, connFlag):
+        return self.connModel.update(port, outFlag=outFlag, inFlag=inFlag, connFlag=connFlag)
 
-    def checkModules(self):
-        for mod in self.modules:
-            self.checkModule(mod)
+    def setDependency(self, dep, flag):
+        return self.depModel.update(dep, flag=flag)
 
-    def checkPorts(self):
+    # running flag for row i of self.modules
+    def reportModule(self, i, flag):
+        self.setRunning(self.modules[i], flag)
+
+    # results of commands cancelled read as missing ports, the rows
+    # keep what they showed then (see Engine.checkModules)
+    def reportPorts(self, conns, status):
+        if self.manager.shared.cancelToken.isSet():
+            return
+        ports, connected=status
+        for port, c in zip(self.connections, conns):
+            self.setConnection(port, ports[c[0]], ports[c[1]], connected[(c[0], c[1])])
+
+    # called by the manager every UI_UPDATE_INTERVAL on the Tk thread
+    def sync(self):
+        self.modTable.sync()
+        self.connTable.sync()
+        for dep in self.portDep+self.nodeDep:
+            if dep.version!=dep.row.version:
+                dep.version=dep.row.version
+                dep.flag.set(int(bool(dep.row.flag)))
+                if dep.row.flag==None:
+                    dep.entry.config(foreground="#808080")
+                else:
+                    dep.entry.config(foreground="#000000")
+
+    # snapshots of the rows, to be taken on the Tk thread
+    def moduleData(self):
+        self.modTable.store()
+        return [mod.getData() for mod in self.modules]
+
+    def connectionData(self):
+        self.connTable.store()
+        conns=[]
         for port in self.connections:
-            cmd=['yarp', 'exists', port.outEntry.get()]
-#            ret=subprocess.Popen(cmd).wait()
-            ret=self.spawnProcess(cmd)
-            connectionFlag=True
-            if ret!=0:
-                port.outFlag.set(0)
-            else:
-                port.outFlag.set(1)
+            conns.append((port.output, port.input, port.protocol))
+        return conns
 
-            cmd=['yarp', 'exists', port.inEntry.get()]
-            ret=self.spawnProcess(cmd)
+    def dependencyNames(self):
+        names=[]
+        for dep in self.portDep+self.nodeDep:
+            self.depModel.update(dep.row, name=dep.entry.get())
+            names.append(dep.row.port())
+        return names
 
-            if ret!=0:
-                port.inFlag.set(0)
-            else:
-                port.inFlag.set(1)
+    def checkModules(self):
+        self.submitAction("Check Modules", self.engine.checkModules, (self.moduleData(), self.reportModule))
 
-            ret=1
-            if port.inFlag.get() and port.outFlag.get():
-                cmd=['yarp', 'exists', port.outEntry.get(), port.inEntry.get()]
-                print cmd
-                ret=self.spawnProcess(cmd)
-    
-            if ret!=0:
-                port.connFlag.set(0)
-            else:
-                port.connFlag.set(1)
+    def checkPorts(self):
+        self.submitAction("Check Ports", self.checkPortsWork, (self.connectionData(),))
 
-            port.update()
+    def checkPortsWork(self, conns, registry=None):
+        self.reportPorts(conns, self.engine.checkPorts(conns, registry))
 
     def update(self):
-        self.checkModules()
-        self.checkPorts()
+        self.submitAction("Update", self.updateWork, (self.moduleData(), self.connectionData()))
+
+    def updateWork(self, data, conns):
+        self.engine.checkModules(data, self.reportModule)
+        self.checkPortsWork(conns)
         
     def connectPorts(self):
-        self.checkPorts()
-
-        for port in self.connections:
-            if port.inFlag.get() and port.outFlag.get():
-                cmd=['yarp', 'connect', port.outEntry.get(), port.inEntry.get(), port.protEntry.get()]
-                self.spawnProcess(cmd)
-
-                port.update()
+        self.submitAction("Connect", self.connectPortsWork, (self.connectionData(),))
 
-        self.checkPorts()
+    def connectPortsWork(self, conns):
+        results, status=self.engine.connectPorts(conns)
+        self.reportPorts(conns, status)
 
     def disconnectPorts(self):
-        self.checkPorts()
-
-        for port in self.connections:
-            if port.inFlag.get() and port.outFlag.get():
-                cmd=['yarp', 'disconnect', port.outEntry.get(), port.inEntry.get()]
-                self.spawnProcess(cmd)
-
-                port.update()
-
-        self.checkPorts()
+        self.submitAction("Disconnect", self.disconnectPortsWork, (self.connectionData(),))
+
+    def disconnectPortsWork(self, conns):
+        results, status=self.engine.disconnectPorts(conns)
+        self.reportPorts(conns, status)
+
+    # restart dead modules while on, see Supervisor
+    def supervise(self):
+        if self.supervising.get():
+            self.supervisor=Supervisor(self.engine, self.moduleData(), self.connectionData(), self.reportModule)
+            self.supervisor.start()
+        elif self.supervisor!=None:
+            self.supervisor.stop()
+            self.supervisor=None
+
+    # modules about to be stopped on purpose, the supervisor must not
+    # start them again
+    def stopping(self, data):
+        if self.supervisor!=None:
+            for d in data:
+                self.supervisor.stopped(d.tag)
+        return data
 
     def quitModule(self, mod):
-        node=mod.entryNode.get()
-        tag=mod.entryTag.get()
-
-        cmd=['yarprun', '--on', '/'+node, '--sigterm', tag]
-        ret=self.spawnProcess(cmd)
+        self.submitAction("Ctrl-c "+mod.tag, self.engine.quitModule, (self.stopping([mod.getData()])[0],))
 
     def killModule(self, mod):
-        node=mod.entryNode.get()
-        tag=mod.entryTag.get()
-
-        cmd=['yarprun', '--on', '/'+node, '--kill', tag, '9']
-        ret=self.spawnProcess(cmd)
+        self.submitAction("Kill "+mod.tag, self.engine.killModule, (self.stopping([mod.getData()])[0],))
 
     def runModule(self, mod):
         #ret=self.checkDeps()
@@ -528,140 +3247,583 @@ class App:
             #print "Sorry some dependencies were not met, cannot run the application"
             #return
 
-        self.checkModule(mod)
+        self.submitAction("Run "+mod.tag, self.runModuleWork, (mod, mod.getData()))
 
-        if mod.runningFlag:
-            print "Module already running, skipping"
-            return
+    def runModuleWork(self, mod, data):
+        self.setRunning(mod, self.engine.runModule(data))
 
-        node=mod.entryNode.get()
-        tag=mod.entryTag.get()
-        stdioNode=mod.entryIoNode.get()
-        node=mod.entryNode.get()
-        parameters=mod.parameters
-        name=mod.entryName.get()
-        hold = ""
-        if (mod.hold.get()):
-            hold = "--hold"
-        workdir=mod.workdir
-        
-        if (stdioNode == "none"):
-            if(workdir == ""):
-                cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag]
-            else:
-                cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--workdir',workdir]
-        else:
-            if(workdir == ""):
-                cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--stdio', '/'+stdioNode, hold]
-            else:
-                cmd=['yarprun', '--cmd', '\"'+name+' '+parameters+'\"', '--on', '/'+node, '--as', tag, '--stdio', '/'+stdioNode, hold, '--workdir',workdir]
-
-        ret=self.spawnProcess(cmd)
-
-        self.checkModule(mod)
-            
     def checkModule(self, mod):
-        node=mod.entryNode.get()
-        tag=mod.entryTag.get()
-        
-        cmd=['yarprun', '--on','/'+node,'--isrunning', tag]
-        ret=self.spawnProcess(cmd)
+        self.submitAction("Check "+mod.tag, self.checkModuleWork, (mod, mod.getData()))
 
-        if ret==0:
-            mod.runningFlag=True
-            mod.update()
-        else:
-            mod.runningFlag=False
-            mod.update()
+    def checkModuleWork(self, mod, data):
+        running=self.engine.checkModule(data)
+        if not self.manager.shared.cancelToken.isSet():
+            self.setRunning(mod, running)
         
     def runModules(self):
-        print "-- Running modules"
-
         #ret=self.checkDeps()
         #if not ret:
             #print "Sorry some dependencies were not met, cannot run the application"
             #return
 
-        self.checkModules()
-
-        for mod in self.modules:
-            self.runModule(mod)
+        self.submitAction("Run Modules", self.engine.runModules, (self.moduleData(), self.connectionData(), self.reportModule))
             
     def quitModules(self):
-        print "-- Quitting modules"
-
         #ret=self.checkDeps()
 
         #if not ret:
             #print "Sorry some dependencies were not met, cannot stop the application"
             #return
 
-        for mod in self.modules:
-            self.quitModule(mod)
+        self.submitAction("Stop Modules", self.engine.quitModules, (self.stopping(self.moduleData()),))
 
     def killModules(self):
-        print "-- Stopping modules"
-
         #ret=self.checkDeps()
 
         #if not ret:
             #print "Sorry some dependencies were not met, cannot stop the application"
             #return
 
-        for mod in self.modules:
-            self.killModule(mod)
+        self.submitAction("Kill Modules", self.engine.killModules, (self.stopping(self.moduleData()),))
 
-    def checkDeps(self):
-        print "-- Checking port dependencies:"
+    def shutdownModules(self):
+        self.submitAction("Shutdown", self.engine.shutdownModules,
+                          (self.stopping(self.moduleData()), self.connectionData(), self.reportModule))
 
-        dependenciesFlag=True
+    def checkDeps(self):
+        self.submitAction("Checkdep", self.checkDepsWork, (self.dependencyNames(),))
 
-        for dep in self.portDep:
-            cmd=['yarp', 'exists', dep.entry.get()]
-            ret=self.spawnProcess(cmd)
-            if ret==0:
-                dep.flag.set(1)
-            else:
-                dep.flag.set(0)
-                dependenciesFlag=False
+    def checkDepsWork(self, names, registry=None):
+        flags=self.engine.checkDeps(names, registry)
 
-        #print "-- Checking node dependencies:"
-        for dep in  self.nodeDep:
-            cmd=['yarp', 'exists', '/'+dep.entry.get()]
-            ret=self.spawnProcess(cmd)
-            if ret==0:
-                dep.flag.set(1)
-            else:
-                dep.flag.set(0)
+        dependenciesFlag=True
+        for dep, name in zip(self.depModel.records, names):
+            self.setDependency(dep, flags[name])
+            if not flags[name]:
                 dependenciesFlag=False
 
         return dependenciesFlag
 
+    # update the records with the status found by a watch poll, returns
+    # how many differed from what the rows showed (whatever changed
+    # them since the previous poll)
+    def watchChanges(self, running, deps, status, conns):
+        changes=0
+        for i in range(len(running)):
+            if self.setRunning(self.modules[i], running[i]):
+                changes=changes+1
+        for i in range(len(deps)):
+            if self.setDependency(self.depModel.records[i], deps[i]):
+                changes=changes+1
+        ports, connected=status
+        for i in range(len(conns)):
+            output, input, protocol=conns[i]
+            if self.setConnection(self.connections[i], ports[output], ports[input], connected[(output, input)]):
+                changes=changes+1
+        return changes
+
     def dispParameters(self, moduleData):
         w=Window(self.master, moduleData)
 
-# From http://effbot.org/zone/tkinter-autoscrollbar.htm
-class AutoScrollbar(Scrollbar):
-    # a scrollbar that hides itself if it's not needed.  only
-    # works if you use the grid geometry manager.
-    def set(self, lo, hi):
-        if float(lo) <= 0.0 and float(hi) >= 1.0:
-            # grid_remove is currently missing from Tkinter!
-            self.tk.call("grid", "remove", self)
+    # output of the commands of a module row, or of the commands of no
+    # module in particular (connections...) if mod is None
+    def showOutput(self, mod):
+        if mod==None:
+            w=OutputWindow(self.master, self.application.getName()+" output", self.engine.output(None))
+        else:
+            w=OutputWindow(self.master, mod.tag+" output", self.engine.output(mod.tag))
+
+## Main window: one App panel per application of the descriptor file,
+## with actions on all of them at the bottom. The panels share the
+## worker pool, the status cache and the cancel token (see Shared), the
+## "All" actions run the applications concurrently (see fanOut).
+class Manager:
+    def __init__(self, master, applications):
+        self.master=master
+        self.shared=Shared()
+
+        self.actions=WorkerPool(ACTION_WORKERS)
+        self.updates=Queue.Queue()
+        self.activeActions=0
+        # {action number: (name, start time)}, the same action may be
+        # running more than once
+        self.actionStart={}
+        self.actionCount=0
+
+        self.apps=[]
+        for application in applications:
+            appFrame=Frame(master, borderwidth=2, relief=GROOVE)
+            appFrame.pack(fill=X)
+            self.apps.append(App(appFrame, application, self))
+
+        self.actionsFrame=Frame(master)
+        self.actionsFrame.pack()
+        tmpFrame=self.actionsFrame
+
+        c=0
+        if len(self.apps)>1:
+            Label(tmpFrame, text="All applications:").grid(row=0, column=c)
+            c=c+1
+            for text, command in [("Run All", self.runAll), ("Stop All", self.quitAll),
+                                  ("Kill All", self.killAll), ("Shutdown All", self.shutdownAll), ("Check All", self.checkAll),
+                                  ("Connect All", self.connectAll), ("Disconnect All", self.disconnectAll)]:
+                tmp=Button(tmpFrame, text=text, command=command)
+                tmp.grid(row=0, column=c)
+                c=c+1
+
+        tmp=Button(tmpFrame, text="Cancel", command=self.cancel)
+        tmp.grid(row=0, column=c)
+        c=c+1
+        tmp=Button(tmpFrame, text="Stats", command=self.showStats)
+        tmp.grid(row=0, column=c)
+        c=c+1
+
+        # watch mode, see watch()
+        self.watching=IntVar()
+        self.watchInterval=StringVar()
+        self.watchInterval.set(str(WATCH_INTERVAL))
+        self.watchDelay=WATCH_INTERVAL
+        self.watchTimer=None
+        self.watchPool=WorkerPool(1)
+        self.watchRound=0
+        self.watchText=StringVar()
+        self.watchText.set("s")
+        Checkbutton(tmpFrame, text="Watch every", variable=self.watching, command=self.watch).grid(row=0, column=c)
+        Spinbox(tmpFrame, from_=1, to=600, width=4, textvariable=self.watchInterval).grid(row=0, column=c+1)
+        Label(tmpFrame, textvariable=self.watchText).grid(row=0, column=c+2)
+        c=c+2
+
+        self.statusText=StringVar()
+        Label(tmpFrame, textvariable=self.statusText).grid(row=1, column=0, columnspan=c+1, sticky=W)
+
+        #finally load the status: the window shows up right away with
+        #the rows in the "unknown" state, they fill in as the checks of
+        #all the applications come back (see checkAllWork), a slow name
+        #server only delays the rows waiting for it
+        self.shownAt=None
+        self.loadedAt=None
+        self.submitAction("Loading status", self.checkAllWork,
+                          ([(app, app.dependencyNames(), app.moduleData(), app.connectionData()) for app in self.apps],),
+                          self.loaded)
+        self.applyUpdates()
+
+    def commands(self):
+        return sum([app.engine.commands for app in self.apps])
+
+    def showStats(self):
+        w=StatsWindow(self.master, self.shared.metrics)
+
+    ## Startup time: from the start of the process to the first paint
+    ## of the window (shown(), once the main loop is idle) and to the
+    ## status of every row being known (loaded()). Printed, shown in
+    ## the status line and kept in the latency statistics.
+    def shown(self):
+        self.shownAt=time.time()
+        self.startupReport()
+
+    def loaded(self):
+        self.loadedAt=time.time()
+        self.startupReport()
+
+    def startupReport(self):
+        if self.shownAt==None or self.loadedAt==None:
+            return
+        window=self.shownAt-STARTED
+        status=self.loadedAt-STARTED
+        print "-- Startup: window shown in %.2fs, status loaded in %.2fs" % (window, status)
+        self.shared.metrics.add('startup window', window, False)
+        self.shared.metrics.add('startup status', status, False)
+        if self.activeActions==0:
+            self.statusText.set(self.statusText.get()+"; startup: window %.2fs, status %.2fs" % (window, status))
+
+    ## Watch mode: while it is on, the status of all the applications is
+    ## polled in the background (on its own worker, user actions are
+    ## not delayed) and only the rows that differ from what was found
+    ## are updated, see App.watchChanges(). The delay between polls
+    ## starts at the chosen interval, halves (down to WATCH_MIN_INTERVAL)
+    ## after a poll that found changes and grows by half after a quiet
+    ## one, up to WATCH_MAX_FACTOR times the chosen interval.
+    def watch(self):
+        # a poll still running when watch mode is turned off (and maybe
+        # on again) must not schedule another one
+        self.watchRound=self.watchRound+1
+        if self.watching.get():
+            self.watchDelay=self.watchBase()
+            self.watchPoll()
         else:
-            self.grid()
-        Scrollbar.set(self, lo, hi)
-    def pack(self, **kw):
-        raise TclError, "cannot use pack with this widget"
-    def place(self, **kw):
-        raise TclError, "cannot use place with this widget"
+            if self.watchTimer!=None:
+                self.master.after_cancel(self.watchTimer)
+                self.watchTimer=None
+            self.watchText.set("s")
+
+    def watchBase(self):
+        try:
+            return max(WATCH_MIN_INTERVAL, float(self.watchInterval.get()))
+        except ValueError:
+            return WATCH_INTERVAL
+
+    def watchPoll(self):
+        self.watchTimer=None
+        items=[(app, app.moduleData(), app.dependencyNames(), app.connectionData()) for app in self.apps]
+        self.watchPool.submit(self.watchWork, (self.watchRound, items))
+
+    def watchWork(self, round, items):
+        # what the cache remembers is what we are looking for changes
+        # in, the polls go around it (without dropping what the user
+        # actions running meanwhile rely on)
+        changes=0
+        try:
+            registry=self.apps[0].engine.newRegistry(False)
+
+            def poll((app, data, names, conns)):
+                running=app.engine.checkModules(data, None, False)
+                deps=app.engine.checkDeps(names, registry)
+                status=app.engine.checkPorts(conns, registry, False)
+                return running, [deps[name] for name in names], status
+
+            results=fanOut(poll, items)
+            if not self.shared.cancelToken.isSet():
+                for (app, data, names, conns), result in zip(items, results):
+                    # failed, see fanOut
+                    if result==None:
+                        continue
+                    running, deps, status=result
+                    changes=changes+app.watchChanges(running, deps, status, conns)
+        finally:
+            # the next poll is scheduled whatever happened to this one
+            self.post(self.watchDone, round, changes)
+
+    def watchDone(self, round, changes):
+        if round!=self.watchRound or not self.watching.get():
+            return
+        base=self.watchBase()
+        if changes>0:
+            self.watchDelay=max(WATCH_MIN_INTERVAL, self.watchDelay/2.0)
+        else:
+            self.watchDelay=min(base*WATCH_MAX_FACTOR, self.watchDelay*1.5)
+        self.watchText.set("s (%d changed, next in %.1fs)" % (changes, self.watchDelay))
+        self.watchTimer=self.master.after(int(self.watchDelay*1000), self.watchPoll)
+
+    ## Actions run in the background on self.actions, so that the
+    ## window stays responsive. They never touch widgets: the values
+    ## they need are read before submitting (moduleData() etc.), the
+    ## results go to the records of the panels (see Model) and
+    ## applyUpdates() syncs the widgets from them on the Tk thread, in
+    ## batches every UI_UPDATE_INTERVAL; other Tk work is post()ed.
+    ## done, if given, is called on the Tk thread once the action is
+    ## over, unless it was cancelled.
+    def submitAction(self, name, fn, args=(), done=None):
+        self.activeActions=self.activeActions+1
+        self.actionCount=self.actionCount+1
+        number=self.actionCount
+        self.actionStart[number]=(name, time.time())
+        self.statusText.set(name+"...")
+
+        def action(*args):
+            if self.shared.cancelToken.isSet():
+                return
+            fn(*args)
+
+        def finished(job):
+            self.post(self.actionFinished, number, done)
+
+        self.actions.submit(action, args, finished)
+
+    def actionFinished(self, number, done=None):
+        self.activeActions=self.activeActions-1
+        name, start=self.actionStart.pop(number)
+        elapsed=time.time()-start
+        if self.shared.cancelToken.isSet():
+            self.statusText.set(name+" cancelled")
+        else:
+            stats=self.shared.cache.stats()
+            status="%s done in %.1fs (%d commands so far, %d cache hits, %d coalesced)" \
+                   % (name, elapsed, self.commands(), stats['hits'], stats['coalesced'])
+            unreachable=self.shared.breaker.unreachable()
+            if unreachable:
+                status=status+", node unreachable: "+", ".join(unreachable)
+            self.statusText.set(status)
+            if done!=None:
+                done()
+
+        # everything submitted before the cancel has drained
+        if self.activeActions==0:
+            self.shared.cancelToken.clear()
+
+    def cancel(self):
+        if self.activeActions>0:
+            print "-- Cancelling"
+            self.statusText.set("Cancelling...")
+            self.shared.cancelToken.set()
+
+    def post(self, fn, *args):
+        self.updates.put((fn, args))
+
+    def applyUpdates(self):
+        while True:
+            try:
+                fn, args=self.updates.get_nowait()
+            except Queue.Empty:
+                break
+            fn(*args)
+
+        for app in self.apps:
+            app.sync()
+
+        if self.activeActions>0 and not self.shared.cancelToken.isSet():
+            names=", ".join([name for name, start in self.actionStart.values()])
+            stats=self.shared.cache.stats()
+            self.statusText.set("%s... (%d commands, %d cached)" % (names, self.commands(), stats['hits']+stats['coalesced']))
+
+        self.master.after(UI_UPDATE_INTERVAL, self.applyUpdates)
+
+    # submit fn(app, *values) for all the applications at once, values
+    # are snapshots taken by snapshot(app) on the Tk thread
+    def submitAll(self, name, fn, snapshot):
+        items=[(app,)+snapshot(app) for app in self.apps]
+        self.submitAction(name, fanOut, (lambda item: fn(*item), items))
+
+    def runAll(self):
+        self.submitAll("Run All", lambda app, data, conns: app.engine.runModules(data, conns, app.reportModule),
+                       lambda app: (app.moduleData(), app.connectionData()))
+
+    def quitAll(self):
+        self.submitAll("Stop All", lambda app, data: app.engine.quitModules(data),
+                       lambda app: (app.stopping(app.moduleData()),))
+
+    def killAll(self):
+        self.submitAll("Kill All", lambda app, data: app.engine.killModules(data),
+                       lambda app: (app.stopping(app.moduleData()),))
+
+    def shutdownAll(self):
+        self.submitAll("Shutdown All", lambda app, data, conns: app.engine.shutdownModules(data, conns, app.reportModule),
+                       lambda app: (app.stopping(app.moduleData()), app.connectionData()))
+
+    def checkAll(self):
+        self.submitAction("Check All", self.checkAllWork,
+                          ([(app, app.dependencyNames(), app.moduleData(), app.connectionData()) for app in self.apps],))
+
+    def checkAllWork(self, items):
+        registry=self.apps[0].engine.newRegistry()
+
+        def check((app, names, data, conns)):
+            app.checkDepsWork(names, registry)
+            app.engine.checkModules(data, app.reportModule)
+            app.checkPortsWork(conns, registry)
+
+        fanOut(check, items)
+
+    def connectAll(self):
+        self.submitAll("Connect All", lambda app, conns: app.connectPortsWork(conns),
+                       lambda app: (app.connectionData(),))
+
+    def disconnectAll(self):
+        self.submitAll("Disconnect All", lambda app, conns: app.disconnectPortsWork(conns),
+                       lambda app: (app.connectionData(),))
+
+# From http://effbot.org/zone/tkinter-autoscrollbar.htm
+if not HEADLESS:
+    class AutoScrollbar(Scrollbar):
+        # a scrollbar that hides itself if it's not needed.  only
+        # works if you use the grid geometry manager.
+        def set(self, lo, hi):
+            if float(lo) <= 0.0 and float(hi) >= 1.0:
+                # grid_remove is currently missing from Tkinter!
+                self.tk.call("grid", "remove", self)
+            else:
+                self.grid()
+            Scrollbar.set(self, lo, hi)
+        def pack(self, **kw):
+            raise TclError, "cannot use pack with this widget"
+        def place(self, **kw):
+            raise TclError, "cannot use place with this widget"
+
+## Batch mode: run the actions given on the command line on all the
+## applications without a GUI and write the outcome as JSON to out.
+## Each action runs on all the applications concurrently, the next one
+## starts when it is done everywhere. Returns 0 if every
+## module/connection ended up in the expected state.
+def runBatch(applications, actions, out):
+    shared=Shared()
+    batches=[]
+    for application in applications:
+        conns=[]
+        for c in application.connections:
+            conns.append((c.output, c.input, c.protocol))
+        batches.append(Batch(Engine(application, shared), application, conns))
+
+    start=time.time()
+    for action in actions:
+        if action=='--supervise':
+            supervise(batches)
+            continue
+
+        registry=None
+        if action=='--check':
+            # one name server snapshot for all the applications
+            registry=batches[0].engine.newRegistry()
+        fanOut(lambda batch: batch.run(action, registry), batches)
+
+    report={'applications':[batch.report() for batch in batches]}
+    report['elapsed']=round(time.time()-start, 3)
+    report['commands']=sum([batch.engine.commands for batch in batches])
+    report['cache']=shared.cache.stats()
+    report['latency']=shared.metrics.snapshot()
+    report['timeouts']=shared.timeouts.snapshot()
+    report['unreachable']=shared.breaker.unreachable()
+    report['ok']=not False in [batch.ok for batch in batches]
+
+    out.write(json.dumps(report, indent=2, sort_keys=True)+"\n")
+    for batch in batches:
+        batch.engine.close()
+    print shared.metrics.report()
+
+    if report['ok']:
+        return 0
+    return 1
+
+## Batch mode --supervise: supervise all the applications until
+## interrupted (Ctrl-C)
+def supervise(batches):
+    supervisors=[Supervisor(batch.engine, batch.data, batch.conns) for batch in batches]
+    t=time.time()
+    for s in supervisors:
+        s.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print "-- Interrupted"
+    for s in supervisors:
+        s.stop(True)
+
+    for batch, s in zip(batches, supervisors):
+        summary=s.summary()
+        modules=batch.modules(None)
+        for entry in modules:
+            entry.update(summary[entry['tag']])
+        batch.operations.append({'action':'supervise', 'modules':modules, 'elapsed':round(time.time()-t, 3)})
+        batch.ok=batch.ok and not True in [m['crashLoop'] for m in modules]
+
+## Batch mode state and report of one application
+class Batch:
+    def __init__(self, engine, application, conns):
+        self.engine=engine
+        self.application=application
+        self.data=list(application.modules)
+        self.conns=conns
+        self.ok=True
+        self.operations=[]
+        self.elapsed=0
+
+    def modules(self, running, times=None):
+        res=[]
+        for i in range(len(self.data)):
+            d=self.data[i]
+            entry={'name':d.name, 'node':d.node, 'tag':d.tag}
+            if running!=None:
+                entry['running']=running[i]
+            if times!=None:
+                entry['elapsed']=round(times[i], 3)
+            if self.engine.breaker.isOpen(d.node):
+                entry['error']="node unreachable"
+            res.append(entry)
+        return res
+
+    def connections(self, status, times=None):
+        ports, connected=status
+        res=[]
+        for i in range(len(self.conns)):
+            output, input, protocol=self.conns[i]
+            entry={'from':output, 'to':input, 'protocol':protocol,
+                   'output':ports[output], 'input':ports[input],
+                   'connected':connected[(output, input)]}
+            if times!=None:
+                entry['elapsed']=round(times[i], 3)
+            res.append(entry)
+        return res
+
+    # run an action and record it, an action that raises fails the
+    # application (with the error in its report)
+    def run(self, action, registry=None):
+        t=time.time()
+        op={'action':action[2:]}
+        try:
+            self.perform(action, op, registry)
+        except Exception, e:
+            print "--> Error in", action, "of", self.application.getName()+":", str(e)
+            op['error']=str(e)
+            self.ok=False
+        op['elapsed']=round(time.time()-t, 3)
+        self.elapsed=self.elapsed+op['elapsed']
+        self.operations.append(op)
+
+    # the outcome of the action goes to op
+    def perform(self, action, op, registry):
+        engine=self.engine
+        data=self.data
+        conns=self.conns
+        application=self.application
+
+        if action=='--check':
+            deps=engine.checkDeps(application.dependencies.ports+['/'+n for n in application.dependencies.nodes], registry)
+            # both wait for their own jobs on engine.pool, so they run on
+            # threads of their own (see fanOut)
+            running, status=fanOut(lambda check: check(), [lambda: engine.checkModules(data),
+                                                           lambda: engine.checkPorts(conns, registry)])
+            if running==None or status==None:
+                # see fanOut
+                raise RuntimeError("module or port check failed")
+            op['dependencies']=[{'name':n, 'ok':deps[n]} for n in deps.keys()]
+            op['modules']=self.modules(running)
+            op['connections']=self.connections(status)
+            self.ok=self.ok and not False in running and not False in status[1].values() and not False in deps.values()
+        elif action=='--run':
+            results=engine.runModules(data, conns)
+            running=[r[0] for r in results]
+            op['modules']=self.modules(running, [r[1] for r in results])
+            self.ok=self.ok and not False in running
+        elif action=='--stop' or action=='--kill':
+            if action=='--stop':
+                results=engine.quitModules(data)
+            else:
+                results=engine.killModules(data)
+            op['modules']=self.modules(None, [r[1] for r in results])
+            for i in range(len(results)):
+                op['modules'][i]['ret']=results[i][0]
+            self.ok=self.ok and not [r for r in results if r[0]!=0]
+        elif action=='--shutdown':
+            results=engine.shutdownModules(data, conns)
+            op['modules']=self.modules(None, [r[1] for r in results])
+            for i in range(len(results)):
+                op['modules'][i]['shutdown']=results[i][0]
+            self.ok=self.ok and not [r for r in results if r[0]=="failed"]
+        elif action=='--connect' or action=='--disconnect':
+            if action=='--connect':
+                results, status=engine.connectPorts(conns)
+            else:
+                results, status=engine.disconnectPorts(conns)
+            op['connections']=self.connections(status, [r[1] for r in results])
+            if action=='--connect':
+                self.ok=self.ok and not False in status[1].values()
+            else:
+                self.ok=self.ok and not True in status[1].values()
+
+    def report(self):
+        return {'application':self.application.getName(), 'operations':self.operations,
+                'elapsed':round(self.elapsed, 3), 'commands':self.engine.commands, 'ok':self.ok}
 
 def printUsage(scriptName):
     print scriptName, ": python gui for parsing applications xml files"
     print "Usage:"
     print scriptName, 
-    print "app.xml"
+    print "app.xml [--check|--run|--stop|--kill|--connect|--disconnect|--supervise ...]"
     print "app.xml: application descriptor file"
+    print "  with one or more actions the applications are managed without GUI,"
+    print "  actions are executed in the given order and a JSON report is"
+    print "  printed on stdout (exit code 0 if everything went as expected)"
+    print "  --shutdown stops the modules with SIGTERM, killing those that do not exit"
+    print "  --supervise restarts the modules that die until interrupted (Ctrl-C)"
 
 def fileExists(f):
 
@@ -674,13 +3836,25 @@ def fileExists(f):
 
 if __name__ == '__main__':
   
+    # in batch mode stdout is reserved for the JSON report
+    reportFile=sys.stdout
+    if HEADLESS:
+        sys.stdout=sys.stderr
+
     #first check arguments
     argc = len(sys.argv)
 
-    if (argc!=2):
+    if (argc<2):
         printUsage("manager.py")
         sys.exit(1)
 
+    actions=sys.argv[2:]
+    for a in actions:
+        if a not in BATCH_ACTIONS:
+            print "Unknown option", a
+            printUsage("manager.py")
+            sys.exit(1)
+
     appFile = sys.argv[1]
     found=fileExists(appFile)
     
@@ -699,112 +3873,16 @@ if __name__ == '__main__':
             sys.exit(1)
         fullPathApp=appDir+appFile
 
-    appDescription = xml.dom.minidom.parse(fullPathApp)
-
-    applicationList = []
-
-    applications = appDescription.getElementsByTagName("application")
-    for app in applications:
-        napp=AppData();
-
-        name = app.getElementsByTagName("name")[0].firstChild.data
-        print "Application ", name
-
-        napp.setName(name)
-
-        deps=app.getElementsByTagName("dependencies").item(0)
-        if (deps!=None):
-          for p in deps.getElementsByTagName("port"):
-                napp.pushPortDependency(p.firstChild.data)
-
-        for mod in app.getElementsByTagName("module"):
-            name = mod.getElementsByTagName("name")[0].firstChild.data
-            node = mod.getElementsByTagName("node")[0].firstChild.data
-
-            #protect against nodes whose names start with /
-            if (node[0]=='/'):
-                print "WARNING: <node> entry should NOT contain trailing '/'"
-                node=node[1:]
-
-            tag = mod.getElementsByTagName("tag")[0].firstChild.data
-
-            if (mod.getElementsByTagName("parameters").item(0)==None):
-                parameters=""
-            else:
-                parametersNode = mod.getElementsByTagName("parameters")[0]
-                #allow empty sections
-                if (parametersNode.firstChild != None):
-                    parameters = parametersNode.firstChild.data
-
-                    # wanr about wrapping parameters with ""
-                    if (parameters[0]=="\""):
-                        print "WARNING: detected parameter list starting with \" (are you wrapping parameters with \"\"?)"
-                        parameters=parameters[1:]
-                    if (parameters[len(parameters)-1]=="\""):
-                        print "WARNING: detected parameter list ending with \" (are you wrapping parameters with \"\"?)"
-                        parameters=parameters[:len(parameters)-2]
-                                          
-                    # warn about use of ""
-                    if (parameters=="\"\""):
-                       print "WARNING: do not use empty parameter list \"\""
-                       parameters=""
-                else:
-                    parameters=""
-
-            if (mod.getElementsByTagName("workdir").item(0)==None):
-                workdir=""
-            else:
-                workdirNode= mod.getElementsByTagName("workdir")[0]
-                if (workdirNode.firstChild!=None):
-                    workdir=workdirNode.firstChild.data
-                else:
-                     workdir=""
-                     
-            napp.pushNodeDependency(node)
-
-            stdioNode=mod.getElementsByTagName("stdio").item(0)
-            if (stdioNode != None):
-                stdNode=stdioNode.firstChild.data
-                napp.pushModuleWithConsole(name, parameters, node, tag, workdir, stdNode)
-                napp.pushNodeDependency(stdNode)
-            else:
-                napp.pushModuleDetached(name, parameters, node, tag, workdir)
-
-        for c in app.getElementsByTagName("connection"):
-            input=c.getElementsByTagName("input").item(0)
-            if (input != None):
-                print "WARNING: found obsolete tag <input>, please use <to> instead"
-                input=input.firstChild.data
-            else:
-                input=(c.getElementsByTagName("to")[0].firstChild.data)
-
-            output=c.getElementsByTagName("output").item(0)
-            if (output != None):
-                print "WARNING: found obsolete tag <output>, please use <from> instead"
-                output=output.firstChild.data
-            else:
-                output=(c.getElementsByTagName("from")[0].firstChild.data)
-
-            protocol=c.getElementsByTagName("protocol").item(0)
-            if (protocol != None):
-                napp.pushConnection(output, input, protocol.firstChild.data)
-            else:
-                napp.pushConnection(output, input, "tcp")
-
-        # getting temp directory
-        tmpPath  = os.getenv("TMP");
-	if (tmpPath==None):
-		tmpPath="/tmp"
-        
-        logfilename=tmpPath+"/"+napp.getName()+".log"
-        napp.setLogFilename(logfilename)
-        applicationList.append(napp)
+    applicationList = loadApplications(fullPathApp)
 
 
 
 #    for app in applicationList:
 #        app.display()
 
+    if HEADLESS:
+        sys.exit(runBatch(applicationList, actions, reportFile))
+
     root = Tk()
 
     # create scrolled canvas
@@ -830,8 +3908,8 @@ if __name__ == '__main__':
     frame.rowconfigure(1, weight=1)
     frame.columnconfigure(1, weight=1)
     
-    # The application
-    app = App(frame, applicationList[0])
+    # The applications
+    manager = Manager(frame, applicationList)
     
     canvas.create_window(0, 0, anchor=NW, window=frame)
     frame.update_idletasks()
@@ -845,5 +3923,13 @@ if __name__ == '__main__':
     canvas['height'] = height
 
     root.title("Application Manager")
+    root.after_idle(manager.shown)
     root.mainloop()
+
+    # write out what is left of the operation logs
+    for app in manager.apps:
+        if app.supervisor!=None:
+            app.supervisor.stop()
+        app.engine.close()
+    print manager.shared.metrics.report()
     
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+##Copyright (C) 2009 RobotCub Consortium, European Commission FP6 Project IST-004370
+##Permission is granted to copy, distribute, and/or modify this program
+##under the terms of the GNU General Public License, version 2 or any
+##later version published by the Free Software Foundation.
+##
+##A copy of the license can be found at
+##http://www.robotcub.org/icub/license/gpl.txt
+##
+##This program is distributed in the hope that it will be useful, but
+##WITHOUT ANY WARRANTY; without even the implied warranty of
+##MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+##Public License for more details
+
+## Tests of yarpclient.py against its stand-in name and yarprun servers,
+## no yarp installation needed:
+##   python test_yarpclient.py
+
+import unittest
+
+import yarpclient
+from yarpclient import toBottle, parseBottle, runRequest
+
+class BottleTest(unittest.TestCase):
+    def roundTrip(self, items):
+        self.assertEqual(parseBottle(toBottle(items)), items)
+
+    def testPlain(self):
+        self.assertEqual(toBottle([["on", "/node"], ["isrunning", "tag"]]), "(on /node) (isrunning tag)")
+        self.roundTrip([["on", "/node"], ["kill", "tag", 9]])
+
+    def testQuoted(self):
+        self.assertEqual(toBottle(["a b"]), '"a b"')
+        self.roundTrip([["cmd", "module --name /port --text \"hello world\""]])
+        self.roundTrip([["cmd", "back\\slash (paren)"], ["as", ""]])
+
+    def testNested(self):
+        self.roundTrip([[["pid", 1001], ["tag", "cam"], ["status", "running"], ["cmd", "camera --name /cam"]]])
+
+class RunRequestTest(unittest.TestCase):
+    def testKill(self):
+        node, action, groups=runRequest(['yarprun', '--on', '/pc104', '--kill', 'cam', '9'])
+        self.assertEqual(node, "pc104")
+        self.assertEqual(action, "kill")
+        self.assertEqual(groups, [["on", "/pc104"], ["kill", "cam", "9"]])
+
+    def testCmd(self):
+        # quotes around the command line are those of the shell
+        node, action, groups=runRequest(['yarprun', '--cmd', '"camera --name /cam"', '--on', '/pc104', '--as', 'cam'])
+        self.assertEqual(node, "pc104")
+        self.assertEqual(action, "cmd")
+        self.assertEqual(groups, [["cmd", "camera --name /cam"], ["on", "/pc104"], ["as", "cam"]])
+
+    def testUnsupported(self):
+        node, action, groups=runRequest(['yarprun', '--on', '/pc104', '--sysinfo'])
+        self.assertEqual(action, None)
+
+class ServersTest(unittest.TestCase):
+    def setUp(self):
+        self.nameServer=yarpclient.StandInNameServer()
+        self.nameServer.serve()
+        self.runServer=yarpclient.StandInRunServer()
+        self.runServer.serve()
+        self.names=yarpclient.NameClient(*self.nameServer.address())
+        host, port=self.runServer.address()
+        for node in ("/n1", "/n2"):
+            self.names.register(node, host, port)
+        self.runs=yarpclient.RunClient(self.names)
+
+    def tearDown(self):
+        self.runs.close()
+        self.names.close()
+        self.runServer.stop()
+        self.nameServer.stop()
+
+    def testNames(self):
+        self.assertEqual(self.names.query("/n1"), self.runServer.address())
+        self.assertEqual(self.names.query("/missing"), None)
+        self.assertTrue("/n2" in self.names.list())
+        self.assertTrue(self.names.exists("/n1"))
+        self.assertFalse(self.names.exists("/missing"))
+
+    def testCalls(self):
+        ret, out, timedOut, cancelled=self.runs.call(['yarprun', '--cmd', '"camera --name /cam"', '--on', '/n1', '--as', 'cam'], 5)
+        self.assertEqual((ret, timedOut, cancelled), (0, False, False))
+        self.assertEqual(self.runs.call(['yarprun', '--on', '/n1', '--isrunning', 'cam'], 5)[0], 0)
+        self.assertEqual(self.runs.call(['yarprun', '--on', '/n2', '--isrunning', 'cam'], 5)[0], 1)
+
+        ret, out, timedOut, cancelled=self.runs.call(['yarprun', '--on', '/n1', '--ps'], 5)
+        self.assertEqual(ret, 0)
+        self.assertTrue("(tag cam)" in out)
+        self.assertTrue('(cmd "camera --name /cam")' in out)
+
+        self.assertEqual(self.runs.call(['yarprun', '--on', '/n1', '--sigterm', 'cam'], 5)[0], 0)
+        self.assertEqual(self.runs.call(['yarprun', '--on', '/n1', '--isrunning', 'cam'], 5)[0], 1)
+
+    def testStdio(self):
+        self.assertRaises(yarpclient.RunClientError, self.runs.call,
+                          ['yarprun', '--cmd', '"yarpview"', '--on', '/n1', '--as', 'view', '--stdio', '/n2'], 5)
+
+    def testUnregisteredNode(self):
+        self.assertRaises(yarpclient.RunNodeError, self.runs.call, ['yarprun', '--on', '/n3', '--ps'], 5)
+
+    # several requests in flight on one connection get their own replies
+    def testPipelined(self):
+        conn=yarpclient.RunConnection(self.runServer.address())
+        try:
+            tags=["m%d" % i for i in range(20)]
+            starts=[conn.send(toBottle([["on", "/n1"], ["as", tag], ["cmd", tag]])) for tag in tags]
+            checks=[conn.send(toBottle([["on", "/n1"], ["isrunning", tag]])) for tag in tags+["none"]]
+            for reply in starts+checks:
+                reply.done.wait(5)
+                self.assertTrue(reply.done.isSet())
+
+            pids=[parseBottle(reply.line)[0] for reply in starts]
+            self.assertEqual(pids, sorted(pids))
+            table=dict([(tag, pid) for pid, tag, cmd in self.runServer.processes("n1")])
+            self.assertEqual([table[tag] for tag in tags], pids)
+            self.assertEqual([reply.line for reply in checks], ["running"]*len(tags)+['"not running"'])
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,724 @@
+#!/usr/bin/python
+
+##Copyright (C) 2009 RobotCub Consortium, European Commission FP6 Project IST-004370
+##Permission is granted to copy, distribute, and/or modify this program
+##under the terms of the GNU General Public License, version 2 or any
+##later version published by the Free Software Foundation.
+##
+##A copy of the license can be found at
+##http://www.robotcub.org/icub/license/gpl.txt
+##
+##This program is distributed in the hope that it will be useful, but
+##WITHOUT ANY WARRANTY; without even the implied warranty of
+##MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+##Public License for more details
+
+## Talk to the YARP name server directly instead of forking "yarp" for
+## every question. Used by manager.py and icub-cluster.py when it can be
+## imported and the name server can be located; both fall back to the
+## yarp binary whenever NameClient raises NameClientError.
+##
+## The name server text protocol, as seen with telnet:
+##   CONNECT /foo
+##   Welcome /foo
+##   NAME_SERVER query /port
+##   registration name /port ip 10.0.0.1 port 10002 type tcp
+##   *** end of message
+## Connections stay open and are reused for the following requests.
+##
+## RunClient does the same for the yarprun servers (the port named after
+## the node), with their command protocol:
+##   CONNECT /foo
+##   Welcome /foo
+##   d
+##   (on /node) (as tag) (cmd "module --name /port")
+##   1234 started
+## one bottle per request and one line per reply; requests are
+## pipelined on a single connection per node. Launches with --stdio
+## (which yarprun sends to the stdio node) are left to the binary.
+
+import os
+import socket
+import threading
+import time
+import SocketServer
+
+# a couple of constants
+NAME_TIMEOUT=5                #seconds to wait for the name server
+NAME_POOL_SIZE=4              #idle name server connections kept open
+PORT_TIMEOUT=2                #seconds to wait for a port to accept a connection
+NAME_RETRY_INTERVAL=10        #seconds before trying again an unreachable name server
+END_OF_MESSAGE="*** end of message"
+
+class NameClientError(Exception):
+    pass
+
+## Where the name server is: $YARP_NAMESERVER (host:port) if set,
+## otherwise the yarp configuration file of the namespace (first line
+## "ip port [mode]"). Returns (host, port) or None.
+def findNameServer(namespace=None):
+    address=os.environ.get("YARP_NAMESERVER")
+    if address:
+        host, port=address.rsplit(":", 1)
+        return host, int(port)
+
+    dirs=[]
+    if os.environ.get("YARP_CONF"):
+        dirs.append(os.environ["YARP_CONF"])
+    home=os.path.expanduser("~")
+    dirs.append(os.path.join(home, ".config", "yarp"))
+    dirs.append(os.path.join(home, ".yarp", "conf"))
+
+    if namespace==None:
+        namespace=os.environ.get("YARP_NAMESPACE")
+    if namespace==None:
+        for d in dirs:
+            try:
+                namespace=open(os.path.join(d, "_namespace.txt")).read().split()[0]
+                break
+            except (IOError, IndexError):
+                pass
+    if namespace==None:
+        namespace="/root"
+
+    names=[namespace.replace("/", "_")+".conf"]
+    if namespace=="/root":
+        names.append("yarp.conf")
+
+    for d in dirs:
+        for name in names:
+            try:
+                v=open(os.path.join(d, name)).read().split()
+                return v[0], int(v[1])
+            except (IOError, IndexError, ValueError):
+                pass
+    return None
+
+## Registration of a port, None if not registered
+def parseRegistration(line):
+    v=line.split()
+    # registration name /port ip 10.0.0.1 port 10002 type tcp
+    if len(v)>=7 and v[0]=="registration" and v[1]=="name":
+        if v[4]!="none" and v[6]!="none":
+            return v[2], v[4], int(v[6])
+    return None
+
+class NameClient:
+    def __init__(self, host, port, record=None):
+        self.host=host
+        self.port=port
+        self.record=record
+        self.idle=[]
+        self.lock=threading.Lock()
+        # while the name server is unreachable requests fail at once
+        self.downUntil=0
+
+    # client for the name server of namespace, None if it cannot be found
+    def fromConfig(namespace=None, record=None):
+        address=findNameServer(namespace)
+        if address==None:
+            return None
+        return NameClient(address[0], address[1], record)
+    fromConfig=staticmethod(fromConfig)
+
+    def connect(self):
+        if time.time()<self.downUntil:
+            raise NameClientError("name server %s:%d unreachable" % (self.host, self.port))
+
+        try:
+            sock=socket.create_connection((self.host, self.port), NAME_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            f=sock.makefile("r")
+            sock.sendall("CONNECT /manager\n")
+            welcome=f.readline()
+        except (socket.error, socket.timeout), e:
+            self.downUntil=time.time()+NAME_RETRY_INTERVAL
+            raise NameClientError("cannot reach the name server %s:%d (%s)" % (self.host, self.port, str(e)))
+
+        if not welcome.startswith("Welcome"):
+            sock.close()
+            raise NameClientError("unexpected answer from the name server: "+welcome.strip())
+        return sock, f
+
+    def release(self, conn):
+        self.lock.acquire()
+        if len(self.idle)<NAME_POOL_SIZE:
+            self.idle.append(conn)
+            conn=None
+        self.lock.release()
+
+        if conn!=None:
+            conn[0].close()
+
+    def exchange(self, conn, request):
+        sock, f=conn
+        sock.sendall("NAME_SERVER "+request+"\n")
+        lines=[]
+        while True:
+            line=f.readline()
+            if line=="":
+                raise socket.error("connection closed by the name server")
+            line=line.strip()
+            if line==END_OF_MESSAGE:
+                return lines
+            lines.append(line)
+
+    # send a request, returns the lines of the answer; a pooled
+    # connection that went stale is replaced once
+    def request(self, request):
+        start=time.time()
+        failed=True
+        try:
+            for attempt in range(2):
+                conn=None
+                self.lock.acquire()
+                if self.idle:
+                    conn=self.idle.pop()
+                self.lock.release()
+
+                fresh=(conn==None)
+                if fresh:
+                    conn=self.connect()
+
+                try:
+                    lines=self.exchange(conn, request)
+                except (socket.error, socket.timeout), e:
+                    conn[0].close()
+                    if fresh:
+                        raise NameClientError("name server request failed (%s)" % str(e))
+                    continue
+
+                self.release(conn)
+                failed=False
+                return lines
+            raise NameClientError("name server request failed")
+        finally:
+            if self.record!=None:
+                self.record("names "+request.split()[0], time.time()-start, failed)
+
+    # (ip, port) of a registered port, None if not registered
+    def query(self, name):
+        for line in self.request("query "+name):
+            reg=parseRegistration(line)
+            if reg!=None and reg[0]==name:
+                return reg[1], reg[2]
+        return None
+
+    # names of the registered ports
+    def list(self):
+        ports=[]
+        for line in self.request("list"):
+            reg=parseRegistration(line)
+            if reg!=None:
+                ports.append(reg[0])
+        return ports
+
+    def register(self, name, host, port):
+        self.request("register %s tcp %s %d" % (name, host, port))
+
+    # like "yarp exists": the port is registered and accepts connections
+    def exists(self, name):
+        address=self.query(name)
+        if address==None:
+            return False
+        try:
+            sock=socket.create_connection(address, PORT_TIMEOUT)
+            sock.close()
+            return True
+        except (socket.error, socket.timeout):
+            return False
+
+    def close(self):
+        self.lock.acquire()
+        idle=self.idle
+        self.idle=[]
+        self.lock.release()
+        for sock, f in idle:
+            sock.close()
+
+## Bottles in text form: (on /node) (isrunning tag) -> [["on", "/node"], ["isrunning", "tag"]]
+def toBottle(items):
+    res=[]
+    for item in items:
+        if isinstance(item, list) or isinstance(item, tuple):
+            res.append("("+toBottle(item)+")")
+        elif isinstance(item, int) or isinstance(item, long):
+            res.append(str(item))
+        elif item!="" and item.find(" ")<0 and item.find('"')<0 and item.find("(")<0 and item.find(")")<0:
+            res.append(item)
+        else:
+            res.append('"'+item.replace("\\", "\\\\").replace('"', '\\"')+'"')
+    return " ".join(res)
+
+def parseBottle(text):
+    stack=[[]]
+    i=0
+    while i<len(text):
+        c=text[i]
+        if c.isspace():
+            i=i+1
+        elif c=="(":
+            stack.append([])
+            i=i+1
+        elif c==")":
+            if len(stack)>1:
+                item=stack.pop()
+                stack[-1].append(item)
+            i=i+1
+        elif c=='"':
+            s=[]
+            i=i+1
+            while i<len(text) and text[i]!='"':
+                if text[i]=="\\" and i+1<len(text):
+                    i=i+1
+                s.append(text[i])
+                i=i+1
+            stack[-1].append("".join(s))
+            i=i+1
+        else:
+            j=i
+            while j<len(text) and not text[j].isspace() and text[j] not in '()"':
+                j=j+1
+            word=text[i:j]
+            try:
+                word=int(word)
+            except ValueError:
+                pass
+            stack[-1].append(word)
+            i=j
+    while len(stack)>1:
+        item=stack.pop()
+        stack[-1].append(item)
+    return stack[0]
+
+## The request a yarprun command line stands for: every --option and
+## the values after it become a group, e.g.
+##   yarprun --on /node --kill tag 9 -> (on /node) (kill tag 9)
+## Returns (node, action, bottle), action is the first of RUN_ACTIONS found.
+RUN_ACTIONS=["cmd", "isrunning", "ps", "sigterm", "kill"]
+
+def runRequest(argv):
+    groups=[]
+    for arg in argv[1:]:
+        if arg.startswith("--"):
+            groups.append([arg[2:]])
+        elif arg!="" and groups:
+            if len(arg)>1 and arg[0]=='"' and arg[-1]=='"':
+                arg=arg[1:-1]
+            groups[-1].append(arg)
+
+    node=None
+    action=None
+    for group in groups:
+        if group[0]=="on" and len(group)>1:
+            node=group[1].lstrip("/")
+        if action==None and group[0] in RUN_ACTIONS:
+            action=group[0]
+    return node, action, groups
+
+class RunReply:
+    def __init__(self):
+        self.done=threading.Event()
+        self.line=None
+        self.error=None
+
+## One connection to a yarprun server: requests are written as soon as
+## they come ("d", then the bottle), a reader thread hands the replies
+## (one line each, in order) to the requests waiting for them.
+class RunConnection:
+    def __init__(self, address):
+        try:
+            self.sock=socket.create_connection(address, NAME_TIMEOUT)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.file=self.sock.makefile("r")
+            self.sock.sendall("CONNECT /manager\n")
+            welcome=self.file.readline()
+        except (socket.error, socket.timeout), e:
+            raise RunNodeError(str(e))
+        if not welcome.startswith("Welcome"):
+            self.sock.close()
+            raise RunClientError("unexpected answer from yarprun: "+welcome.strip())
+
+        # replies may take as long as the command they answer
+        self.sock.settimeout(None)
+        self.pending=[]
+        self.lock=threading.Lock()
+        self.broken=False
+
+        self.thread=threading.Thread(target=self.read)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def send(self, bottle):
+        reply=RunReply()
+        self.lock.acquire()
+        try:
+            if self.broken:
+                raise RunNodeError("connection closed")
+            self.pending.append(reply)
+            try:
+                self.sock.sendall("d\n"+bottle+"\n")
+            except socket.error, e:
+                self.fail(str(e))
+        finally:
+            self.lock.release()
+        return reply
+
+    # called with the lock held
+    def fail(self, error):
+        self.broken=True
+        for reply in self.pending:
+            reply.error=error
+            reply.done.set()
+        self.pending=[]
+
+    def read(self):
+        while True:
+            try:
+                line=self.file.readline()
+            except socket.error, e:
+                line=""
+            self.lock.acquire()
+            if line=="":
+                self.fail("connection closed by yarprun")
+                self.lock.release()
+                return
+            if self.pending:
+                reply=self.pending.pop(0)
+                reply.line=line.strip()
+                reply.done.set()
+            self.lock.release()
+
+    def close(self):
+        self.sock.close()
+
+class RunClientError(Exception):
+    pass
+
+# the node cannot be reached, the command fails (forking yarprun
+# would not do better); raised by RunClient.call() too, so that the
+# caller can tell an unreachable node from a failed command
+class RunNodeError(RunClientError):
+    pass
+
+## Client of the yarprun servers, one persistent connection per node,
+## addresses from the name server (a NameClient).
+class RunClient:
+    def __init__(self, names):
+        self.names=names
+        self.connections={}
+        self.lock=threading.Lock()
+
+    def connection(self, node):
+        self.lock.acquire()
+        conn=self.connections.get(node)
+        self.lock.release()
+        if conn!=None and not conn.broken:
+            return conn
+
+        try:
+            address=self.names.query("/"+node)
+        except NameClientError, e:
+            raise RunClientError(str(e))
+        if address==None:
+            raise RunNodeError("node /"+node+" is not registered")
+
+        conn=RunConnection(address)
+        self.lock.acquire()
+        old=self.connections.get(node)
+        if old!=None and not old.broken:
+            # someone else connected meanwhile
+            conn.close()
+            conn=old
+        else:
+            self.connections[node]=conn
+        self.lock.release()
+        return conn
+
+    # run a yarprun command line, returns (ret, out, timedOut, cancelled)
+    # as the yarprun binary would; cancel is polled while waiting.
+    # RunNodeError if the node could not be reached.
+    def call(self, argv, timeout, cancel=None):
+        node, action, groups=runRequest(argv)
+        if node==None or action==None:
+            raise RunClientError("unsupported yarprun command "+" ".join(argv))
+        # yarprun sends a launch with a console to the --stdio node
+        # instead, left to the binary
+        if [group for group in groups if group[0]=="stdio"]:
+            raise RunClientError("launch with --stdio left to yarprun")
+
+        reply=self.connection(node).send(toBottle(groups))
+
+        deadline=time.time()+timeout
+        while not reply.done.isSet():
+            if cancel!=None and cancel.isSet():
+                return -1, "", False, True
+            if time.time()>deadline:
+                return -1, "", True, False
+            reply.done.wait(0.1)
+
+        if reply.error!=None:
+            raise RunNodeError(reply.error)
+        return self.result(action, parseBottle(reply.line))
+
+    def result(self, action, reply):
+        if action=="cmd":
+            # pid of the new process, negative on failure
+            if reply and isinstance(reply[0], int) and reply[0]>0:
+                return 0, "", False, False
+            return 1, "", False, False
+        if action=="isrunning":
+            return int(reply[:1]!=["running"]), "", False, False
+        if action=="ps":
+            lines=[toBottle(process) for process in reply if isinstance(process, list)]
+            return 0, "\n".join(lines)+"\n", False, False
+        # sigterm, kill
+        return int(reply[:1]!=["ok"]), "", False, False
+
+    def close(self):
+        self.lock.acquire()
+        for conn in self.connections.values():
+            conn.close()
+        self.connections={}
+        self.lock.release()
+
+## Local stand-in for the name server, for tests and benchmarks: speaks
+## the same text protocol, registers every port at its own address (so
+## that exists() finds them alive). Subclasses may override ports() to
+## take the registrations from somewhere else.
+class StandInNameServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address=True
+    daemon_threads=True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        SocketServer.ThreadingTCPServer.__init__(self, (host, port), StandInHandler)
+        self.registrations=set()
+        self.addresses={}
+        self.lock=threading.Lock()
+        self.thread=None
+
+    def address(self):
+        return self.server_address
+
+    def ports(self):
+        self.lock.acquire()
+        res=list(self.registrations)
+        self.lock.release()
+        return res
+
+    def register(self, name):
+        self.lock.acquire()
+        self.registrations.add(name)
+        self.lock.release()
+
+    def unregister(self, name):
+        self.lock.acquire()
+        self.registrations.discard(name)
+        self.lock.release()
+
+    # where a registered port is, by default here: see exists()
+    def portAddress(self, name):
+        self.lock.acquire()
+        address=self.addresses.get(name, self.server_address)
+        self.lock.release()
+        return address
+
+    def registration(self, name):
+        host, port=self.portAddress(name)
+        if name in self.ports():
+            return "registration name %s ip %s port %d type tcp" % (name, host, port)
+        return "registration name %s ip none port none type none" % name
+
+    def answer(self, request):
+        v=request.split()
+        if not v:
+            return []
+        if v[0]=="query" and len(v)>1:
+            return [self.registration(v[1])]
+        if v[0]=="list":
+            return [self.registration(p) for p in self.ports()]
+        if v[0]=="register" and len(v)>1:
+            # register /port [carrier ip port]
+            if len(v)>4:
+                self.lock.acquire()
+                self.addresses[v[1]]=(v[3], int(v[4]))
+                self.lock.release()
+            self.register(v[1])
+            return [self.registration(v[1])]
+        if v[0]=="unregister" and len(v)>1:
+            self.unregister(v[1])
+            return [self.registration(v[1])]
+        return []
+
+    def serve(self):
+        self.thread=threading.Thread(target=self.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class StandInHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line=self.rfile.readline()
+            if line=="":
+                return
+            line=line.strip()
+            if line.startswith("CONNECT"):
+                self.wfile.write("Welcome "+line[len("CONNECT"):].strip()+"\n")
+            elif line.startswith("NAME_SERVER"):
+                answer=self.server.answer(line[len("NAME_SERVER"):])
+                self.wfile.write("".join([a+"\n" for a in answer])+END_OF_MESSAGE+"\n")
+
+## Local stand-in for yarprun servers, for tests and benchmarks: one
+## server answers for all the nodes (register them on a name server at
+## its address). It does not run anything, it only keeps the list of
+## "running" tags per node; subclasses may override startProcess(),
+## stopProcess() and processes() to do more.
+class StandInRunServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address=True
+    daemon_threads=True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        SocketServer.ThreadingTCPServer.__init__(self, (host, port), StandInRunHandler)
+        self.table={}
+        self.lock=threading.Lock()
+        self.nextPid=1000
+
+    def address(self):
+        return self.server_address
+
+    def startProcess(self, node, tag, cmd):
+        self.lock.acquire()
+        self.nextPid=self.nextPid+1
+        self.table[(node, tag)]=(self.nextPid, cmd)
+        pid=self.nextPid
+        self.lock.release()
+        return pid
+
+    def stopProcess(self, node, tag):
+        self.lock.acquire()
+        found=self.table.pop((node, tag), None)
+        self.lock.release()
+        return found!=None
+
+    # list of (pid, tag, cmd) running on node
+    def processes(self, node):
+        self.lock.acquire()
+        res=[(pid, tag, cmd) for (n, tag), (pid, cmd) in self.table.items() if n==node]
+        self.lock.release()
+        return res
+
+    def answer(self, request):
+        groups={}
+        for group in request:
+            if isinstance(group, list) and group:
+                groups[group[0]]=[str(v) for v in group[1:]]
+
+        node=groups.get("on", [""])[0].lstrip("/")
+        if "cmd" in groups:
+            tag=groups.get("as", [""])[0]
+            return [self.startProcess(node, tag, " ".join(groups["cmd"])), "started"]
+        if "isrunning" in groups:
+            tags=[tag for pid, tag, cmd in self.processes(node)]
+            if groups["isrunning"][:1] and groups["isrunning"][0] in tags:
+                return ["running"]
+            return ["not running"]
+        if "ps" in groups:
+            return [[["pid", pid], ["tag", tag], ["status", "running"], ["cmd", cmd], ["env", ""]]
+                    for pid, tag, cmd in self.processes(node)]
+        for action in ("sigterm", "kill"):
+            if action in groups and groups[action]:
+                if self.stopProcess(node, groups[action][0]):
+                    return ["ok"]
+                return ["not running"]
+        return ["error", "unknown request"]
+
+    def serve(self):
+        self.thread=threading.Thread(target=self.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class StandInRunHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line=self.rfile.readline()
+            if line=="":
+                return
+            line=line.strip()
+            if line.startswith("CONNECT"):
+                self.wfile.write("Welcome "+line[len("CONNECT"):].strip()+"\n")
+            elif line=="d":
+                request=parseBottle(self.rfile.readline())
+                self.wfile.write(toBottle(self.server.answer(request))+"\n")
+
+def printUsage(scriptName):
+    print scriptName, ": client of the YARP name server"
+    print "Usage:"
+    print scriptName,
+    print "--serve [port] [/port ...] | --serve-yarprun [port] [/node ...] | query /port | list | exists /port"
+    print "  --serve: run a stand-in name server with the given ports registered"
+    print "  --serve-yarprun: run a stand-in yarprun server for the given nodes,"
+    print "    registered on the name server"
+    print "  otherwise the request is sent to the name server found as yarp does"
+    print "  (or at $YARP_NAMESERVER=host:port)"
+
+if __name__ == '__main__':
+    import sys
+
+    args=sys.argv[1:]
+    if not args:
+        printUsage("yarpclient.py")
+        sys.exit(1)
+
+    if args[0]=="--serve":
+        port=10000
+        if len(args)>1 and not args[1].startswith("/"):
+            port=int(args[1])
+            args=args[1:]
+        server=StandInNameServer("127.0.0.1", port)
+        for name in args[1:]:
+            server.register(name)
+        print "Stand-in name server on %s:%d" % server.address()
+        server.serve_forever()
+
+    client=NameClient.fromConfig()
+    if client==None:
+        print "Cannot find the name server"
+        sys.exit(1)
+
+    if args[0]=="--serve-yarprun":
+        port=0
+        if len(args)>1 and not args[1].startswith("/"):
+            port=int(args[1])
+            args=args[1:]
+        server=StandInRunServer("127.0.0.1", port)
+        try:
+            for node in args[1:]:
+                client.register(node, server.address()[0], server.address()[1])
+        except NameClientError, e:
+            print "--> Error", str(e)
+            sys.exit(1)
+        print "Stand-in yarprun server on %s:%d" % server.address()
+        server.serve_forever()
+
+    try:
+        if args[0]=="query" and len(args)>1:
+            print client.query(args[1])
+        elif args[0]=="list":
+            for name in client.list():
+                print name
+        elif args[0]=="exists" and len(args)>1:
+            sys.exit(int(not client.exists(args[1])))
+        else:
+            printUsage("yarpclient.py")
+            sys.exit(1)
+    except NameClientError, e:
+        print "--> Error", str(e)
+        sys.exit(1)